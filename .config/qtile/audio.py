@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+from libqtile import widget
+from libqtile.log_utils import logger
+
+try:
+    import pulsectl
+except ImportError:
+    pulsectl = None
+
+# A step is applied right away; those arriving within this window after it
+# become one set-volume call. Longer than X's autorepeat interval (25 Hz by
+# default, so 40 ms) so that a held key is merged too.
+STEP_WINDOW = 0.1
+# Wait between attempts to reconnect the event listener (s)
+RECONNECT_DELAY = 2.0
+
+# Used when pulsectl is not installed
+CMD_AUDIO_MIC_MUTE = ['pactl', 'set-source-mute', '@DEFAULT_SOURCE@', 'toggle']
+CMD_AUDIO_MUTE_UNMUTE = ['pactl', 'set-sink-mute', '@DEFAULT_SINK@', 'toggle']
+
+
+class Audio:
+    """ Persistent PulseAudio/PipeWire client owned by the config
+
+    Commands go through one connection (pulsectl); a second one, in a
+    daemon thread, listens to server events and notifies subscribers on
+    the event loop, reconnecting if the server restarts, and stops once
+    nobody listens. The server is libpulse's default, so PULSE_SERVER can
+    point it to a stand-in server. Without pulsectl, falls back to pactl.
+    """
+
+    def __init__(self, client_name: str = "qtile", server: Optional[str] = None) -> None:
+        self.client_name = client_name
+        self.server = server
+        self.available = pulsectl is not None
+        self.qtile = None
+        self.volume = 0  # percent
+        self.muted = False
+        self.listeners: List[Callable[[], None]] = []
+        self._pulse = None
+        self._listener: Optional[threading.Thread] = None
+        self._events = None  # the listener thread's connection
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._refresh_queued = False
+        self._pending = 0
+        self._pending_since = 0.0
+        self._handle = None
+
+    @property
+    def pulse(self):
+        if self._pulse is None:
+            self._pulse = pulsectl.Pulse(self.client_name, server=self.server)
+        return self._pulse
+
+    def _default_sink(self):
+        return self.pulse.get_sink_by_name(self.pulse.server_info().default_sink_name)
+
+    def _default_source(self):
+        return self.pulse.get_source_by_name(self.pulse.server_info().default_source_name)
+
+    def _call(self, func, *args) -> None:
+        try:
+            func(*args)
+        except Exception:
+            # Server restarted (e.g. pipewire update): reconnect once
+            logger.exception("Audio command failed, reconnecting")
+            self._pulse = None
+            func(*args)
+
+    def step(self, qtile, delta: int) -> None:
+        """ Change volume by delta percent, merging repeated steps """
+        self.qtile = qtile
+        if not self._pending:
+            self._pending_since = time.perf_counter()
+        self._pending += delta
+        if self._handle is None:
+            self._apply_step()
+
+    def _apply_step(self) -> None:
+        delta, self._pending = self._pending, 0
+        if not delta:
+            self._handle = None
+            return
+        # Steps until the end of the window wait for it
+        self._handle = self.qtile.call_later(STEP_WINDOW, self._apply_step)
+        if not self.available:
+            self.qtile.cmd_spawn(['pactl', 'set-sink-volume', '@DEFAULT_SINK@', f'{delta:+d}%'])
+            return
+
+        def set_volume():
+            sink = self._default_sink()
+            level = max(0.0, sink.volume.value_flat + delta / 100)
+            self.pulse.volume_set_all_chans(sink, level)
+        self._call(set_volume)
+        logger.debug("Volume %+d%% applied %.1f ms after the first keypress",
+                     delta, (time.perf_counter() - self._pending_since) * 1000)
+
+    def toggle_mute(self, qtile) -> None:
+        if not self.available:
+            qtile.cmd_spawn(CMD_AUDIO_MUTE_UNMUTE)
+            return
+
+        def toggle():
+            sink = self._default_sink()
+            self.pulse.mute(sink, not sink.mute)
+        self._call(toggle)
+
+    def toggle_mic_mute(self, qtile) -> None:
+        if not self.available:
+            qtile.cmd_spawn(CMD_AUDIO_MIC_MUTE)
+            return
+
+        def toggle():
+            source = self._default_source()
+            self.pulse.mute(source, not source.mute)
+        self._call(toggle)
+
+    def subscribe(self, qtile, listener: Callable[[], None]) -> None:
+        """ Call listener (on the event loop) whenever the sink changes """
+        self.qtile = qtile
+        self.listeners.append(listener)
+        self.refresh()
+        with self._lock:
+            self._stop.clear()
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+
+    def unsubscribe(self, listener: Callable[[], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+        if not self.listeners:
+            self._stop.set()
+            events = self._events
+            if events is not None:
+                events.event_listen_stop()  # thread-safe in pulsectl
+
+    def _listen(self) -> None:
+        while True:
+            with self._lock:
+                if self._stop.is_set():
+                    self._listener = None
+                    return
+            try:
+                with pulsectl.Pulse(f"{self.client_name}-events", server=self.server) as pulse:
+                    pulse.event_mask_set("sink", "server")
+                    pulse.event_callback_set(self._on_event)
+                    self._events = pulse
+                    if self._stop.is_set():
+                        continue
+                    # The sink may have changed while disconnected
+                    self._on_event(None)
+                    pulse.event_listen()
+            except Exception:
+                logger.exception("Audio event listener disconnected, reconnecting")
+                self._stop.wait(RECONNECT_DELAY)
+            finally:
+                self._events = None
+
+    def _on_event(self, event) -> None:
+        # Runs in the listener thread: a burst of events becomes one refresh
+        if not self._refresh_queued:
+            self._refresh_queued = True
+            self.qtile.call_soon_threadsafe(self.refresh)
+
+    def refresh(self) -> None:
+        self._refresh_queued = False
+        try:
+            sink = self._default_sink()
+        except Exception:
+            logger.exception("Could not read the default sink")
+            self._pulse = None
+            return
+        self.volume = round(sink.volume.value_flat * 100)
+        self.muted = bool(sink.mute)
+        for listener in self.listeners:
+            listener()
+
+
+# reload_config() re-imports this module too: keep the connections and
+# the listener thread of the previous import instead of opening new ones
+AUDIO = globals().get("AUDIO") or Audio()
+
+
+def volume_step(delta: int):
+    """ Volume change usable with lazy.function """
+    def _inner(qtile):
+        AUDIO.step(qtile, delta)
+    return _inner
+
+
+def toggle_mute(qtile):
+    AUDIO.toggle_mute(qtile)
+
+
+def toggle_mic_mute(qtile):
+    AUDIO.toggle_mic_mute(qtile)
+
+
+class Volume(widget.Volume):
+    """ Volume widget updated from server events instead of polling amixer """
+
+    def timer_setup(self):
+        if not AUDIO.available:
+            return super().timer_setup()
+        AUDIO.subscribe(self.qtile, self._on_change)
+
+    def get_volume(self):
+        if not AUDIO.available:
+            return super().get_volume()
+        return -1 if AUDIO.muted else AUDIO.volume
+
+    def _on_change(self) -> None:
+        volume = self.get_volume()
+        if volume != self.volume:
+            self.volume = volume
+            self._update_drawer()
+            self.bar.draw()
+
+    def finalize(self):
+        AUDIO.unsubscribe(self._on_change)
+        super().finalize()
+
+
+if __name__ == "__main__":
+    # Keypress-to-change latency and set-volume calls against a stand-in
+    # connection, for a single press and a key held 2 s: python audio.py
+    import asyncio
+    import types
+
+    class Pulse:
+        def __init__(self):
+            self.level, self.calls = 0.5, []
+
+        def server_info(self):
+            return types.SimpleNamespace(default_sink_name="sink")
+
+        def get_sink_by_name(self, name):
+            return types.SimpleNamespace(volume=types.SimpleNamespace(value_flat=self.level))
+
+        def volume_set_all_chans(self, sink, level):
+            self.level = level
+            self.calls.append(time.perf_counter())
+
+    class Qtile:
+        def call_later(self, delay, func, *args):
+            return asyncio.get_running_loop().call_later(delay, func, *args)
+
+    async def press(audio, repeats: int, interval: float = 0.04) -> float:
+        """ Returns the latency of the first change (ms) """
+        pressed = time.perf_counter()
+        for _ in range(repeats):
+            audio.step(Qtile(), +2)
+            await asyncio.sleep(interval)
+        await asyncio.sleep(STEP_WINDOW * 2)
+        return (audio.pulse.calls[0] - pressed) * 1000
+
+    async def main():
+        for repeats in (1, 50):
+            audio = Audio()
+            audio.available, audio._pulse = True, Pulse()
+            latency = await press(audio, repeats)
+            assert round(audio.pulse.level * 100) == 50 + 2 * repeats
+            print(f"{repeats} keypress(es) at 25 Hz: first change after {latency:.2f} ms, "
+                  f"{len(audio.pulse.calls)} set-volume call(s)")
+
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple
+
+from libqtile.log_utils import logger
+
+from notify import NOTIFIER
+from timeline import TRACER
+
+REPORT_PATH = os.path.expanduser("~/.cache/qtile/autostart.json")
+
+
+class Task:
+    """ A program to run at login, once the tasks it comes after are done
+
+    Tasks run to completion unless daemon is set: a daemon counts as done
+    as soon as it is started (it is spawned detached, like lazy.spawn).
+    """
+
+    __slots__ = ("name", "argv", "after", "daemon", "start", "end", "returncode", "error")
+
+    def __init__(self, name: str, argv: List[str], after: Tuple[str, ...] = (),
+                 daemon: bool = False) -> None:
+        self.name = name
+        self.argv = [os.path.expanduser(arg) for arg in argv]
+        self.after = after
+        self.daemon = daemon
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "argv": self.argv,
+            "after": list(self.after),
+            "daemon": self.daemon,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round((self.end - self.start) * 1000, 1),
+            "returncode": self.returncode,
+            "error": self.error,
+        }
+
+
+def check(tasks: List[Task]) -> None:
+    """ Raise ValueError on unknown or circular dependencies """
+    by_name = {task.name: task for task in tasks}
+    state: Dict[str, int] = {}  # 1 visiting, 2 done
+
+    def visit(task: Task) -> None:
+        if state.get(task.name) == 2:
+            return
+        if state.get(task.name) == 1:
+            raise ValueError(f"Autostart: circular dependency through {task.name}")
+        state[task.name] = 1
+        for name in task.after:
+            if name not in by_name:
+                raise ValueError(f"Autostart: {task.name} comes after unknown task {name}")
+            visit(by_name[name])
+        state[task.name] = 2
+
+    for task in tasks:
+        visit(task)
+
+
+def process_age() -> Optional[float]:
+    """ Seconds since this (qtile) process started """
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return uptime - started / os.sysconf("SC_CLK_TCK")
+
+
+class Autostart:
+    def __init__(self, tasks: List[Task]) -> None:
+        check(tasks)
+        self.tasks = tasks
+
+    async def _run_task(self, qtile, task: Task, done: Dict[str, asyncio.Event]) -> None:
+        for name in task.after:
+            await done[name].wait()
+        task.start = time.perf_counter()
+        try:
+            if task.daemon:
+                pid = qtile.cmd_spawn(task.argv)
+                if not isinstance(pid, int) or pid <= 0:
+                    raise OSError(f"could not spawn {task.argv[0]}")
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *task.argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                task.returncode = await process.wait()
+        except OSError as e:
+            task.error = str(e)
+            logger.warning("Autostart: %s failed: %s", task.name, e)
+        finally:
+            task.end = time.perf_counter()
+            TRACER.complete(task.name, "autostart", task.start, task.end, argv=task.argv)
+            done[task.name].set()
+
+    async def run(self, qtile) -> float:
+        """ Run every task as soon as its dependencies are done; returns the total (ms) """
+        age = process_age()
+        origin = time.perf_counter()
+        done = {task.name: asyncio.Event() for task in self.tasks}
+        await asyncio.gather(*(self._run_task(qtile, task, done) for task in self.tasks))
+        total = (time.perf_counter() - origin) * 1000
+        self.report(origin, total, age)
+        return total
+
+    def report(self, origin: float, total: float, age: Optional[float]) -> None:
+        since_start = None if age is None else round(age * 1000 + total, 1)
+        report = {
+            "total_ms": round(total, 1),
+            "since_qtile_start_ms": since_start,
+            "tasks": {task.name: task.to_dict(origin) for task in self.tasks},
+        }
+        try:
+            os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+            with open(REPORT_PATH, "w") as f:
+                json.dump(report, f, indent=2)
+        except OSError:
+            logger.exception("Could not write %s", REPORT_PATH)
+
+        slowest = max(self.tasks, key=lambda t: t.end - t.start)
+        logger.info("Autostart done in %.0f ms (%s ms since qtile started), slowest: %s (%.0f ms)",
+                    total, since_start, slowest.name, (slowest.end - slowest.start) * 1000)
+        failed = [t.name for t in self.tasks if t.error]
+        if failed:
+            NOTIFIER.send("Autostart", f"Failed: {', '.join(failed)}", expire=6000, tag="autostart")
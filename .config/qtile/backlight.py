@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import os
+from typing import Callable, List, Optional
+
+from libqtile import widget
+from libqtile.log_utils import logger
+
+SYSFS_ROOT = "/sys/class/backlight"
+# Key repeats within a frame are merged into one write
+FRAME = 1 / 60
+
+
+class Backlight:
+    """ Brightness written straight to the backlight's sysfs node
+
+    Writing needs the usual udev rule giving the video group write access to
+    /sys/class/backlight/*/brightness; without it each write falls back to
+    brightnessctl. With ramp_frames > 0 changes are eased over that many
+    frames instead of jumping.
+    """
+
+    def __init__(self, name: str, root: str = SYSFS_ROOT, ramp_frames: int = 0) -> None:
+        self.name = name
+        self.path = os.path.join(root, name)
+        self.ramp_frames = ramp_frames
+        self.listeners: List[Callable[[], None]] = []
+        self.writes = 0
+        self._max: Optional[int] = None
+        self._value: Optional[int] = None
+        self._target: Optional[int] = None
+        self._handle = None
+        self.qtile = None
+
+    def config_fingerprint(self) -> tuple:
+        """ What incremental reloads compare: not the brightness """
+        return (self.path, self.ramp_frames)
+
+    def _read(self, node: str) -> int:
+        with open(os.path.join(self.path, node)) as f:
+            return int(f.read())
+
+    @property
+    def max_brightness(self) -> int:
+        if self._max is None:
+            self._max = self._read("max_brightness")
+        return self._max
+
+    @property
+    def value(self) -> int:
+        """ Current brightness; re-read unless a change is being written
+
+        Firmware keys, brightnessctl or logind may have changed it since.
+        """
+        if self._target is None or self._value is None:
+            try:
+                self._value = self._read("actual_brightness")
+            except OSError:
+                self._value = self._read("brightness")
+        return self._value
+
+    @property
+    def percent(self) -> float:
+        return (self._target if self._target is not None else self.value) / self.max_brightness
+
+    def step(self, qtile, percent: int) -> None:
+        """ Change brightness by percent of the maximum, merging key repeats """
+        self.qtile = qtile
+        current = self._target if self._target is not None else self.value
+        delta = round(self.max_brightness * percent / 100)
+        self._target = min(self.max_brightness, max(0, current + delta))
+        self._notify()
+        if self._handle is None:
+            self._handle = qtile.call_later(FRAME, self._flush, self.ramp_frames)
+
+    def _flush(self, frames_left: int) -> None:
+        self._handle = None
+        if frames_left > 0:
+            value = self.value + round((self._target - self.value) / (frames_left + 1))
+        else:
+            value = self._target
+        if value != self.value:
+            self._write(value)
+        if value != self._target:
+            self._handle = self.qtile.call_later(FRAME, self._flush, frames_left - 1)
+        else:
+            self._target = None
+
+    def _write(self, value: int) -> None:
+        self.writes += 1
+        self._value = value
+        try:
+            with open(os.path.join(self.path, "brightness"), "w") as f:
+                f.write(str(value))
+        except PermissionError:
+            logger.warning("No write access to %s, using brightnessctl", self.path)
+            self.qtile.cmd_spawn(["brightnessctl", "--device", self.name, "set", str(value)])
+
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[], None]) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self) -> None:
+        for listener in self.listeners:
+            listener()
+
+
+def brightness_step(backlight: Backlight, percent: int):
+    """ Brightness change usable with lazy.function """
+    def _inner(qtile):
+        backlight.step(qtile, percent)
+    return _inner
+
+
+class Brightness(widget.TextBox):
+    """ Shows the brightness cached by a Backlight, updated on each change """
+
+    defaults = [
+        ("backlight", None, "Backlight instance to show"),
+        ("format", "{percent:2.0%}", "Display format"),
+    ]
+
+    def __init__(self, **config):
+        super().__init__("", **config)
+        self.add_defaults(Brightness.defaults)
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        self.text = self._render()
+        self.backlight.subscribe(self._on_change)
+
+    def _render(self) -> str:
+        try:
+            return self.format.format(percent=self.backlight.percent)
+        except OSError:
+            return "N/A"
+
+    def _on_change(self) -> None:
+        self.update(self._render())
+
+    def finalize(self):
+        self.backlight.unsubscribe(self._on_change)
+        super().finalize()
+
+
+if __name__ == "__main__":
+    # Against a temporary fake sysfs tree: python backlight.py
+    import tempfile
+    import types
+
+    class Qtile:
+        def __init__(self):
+            self.pending = []
+
+        def call_later(self, delay, func, *args):
+            self.pending.append((func, args))
+            return types.SimpleNamespace(cancel=lambda: None)
+
+        def frame(self):
+            pending, self.pending = self.pending, []
+            for func, args in pending:
+                func(*args)
+
+    def node(root: str, name: str, value=None) -> int:
+        path = os.path.join(root, "fake", name)
+        if value is None:
+            with open(path) as f:
+                return int(f.read())
+        with open(path, "w") as f:
+            f.write(f"{value}\n")
+
+    with tempfile.TemporaryDirectory() as root:
+        os.mkdir(os.path.join(root, "fake"))
+        node(root, "max_brightness", 1000)
+        node(root, "brightness", 500)
+        node(root, "actual_brightness", 500)
+        qtile = Qtile()
+        shown = []
+        backlight = Backlight("fake", root=root)
+        backlight.subscribe(lambda: shown.append(backlight.percent))
+
+        # A burst of key repeats within one frame: a single write
+        for _ in range(5):
+            backlight.step(qtile, +5)
+        assert shown[-1] == 0.75 and backlight.writes == 0
+        qtile.frame()
+        assert backlight.writes == 1 and node(root, "brightness") == 750
+
+        # Changed behind our back (firmware keys): the next step starts from it
+        node(root, "max_brightness", 5)  # read once, never again
+        node(root, "actual_brightness", 200)
+        backlight.step(qtile, -10)
+        qtile.frame()
+        assert backlight.writes == 2 and node(root, "brightness") == 100
+        node(root, "max_brightness", 1000)
+
+        # No actual_brightness node: falls back to brightness
+        os.remove(os.path.join(root, "fake", "actual_brightness"))
+        assert backlight.value == 100
+
+        # Eased over 3 frames: 3 intermediate writes and the target
+        ramped = Backlight("fake", root=root, ramp_frames=3)
+        ramped.step(qtile, +40)
+        frames = 0
+        while qtile.pending:
+            qtile.frame()
+            frames += 1
+        assert ramped.writes == 4 and frames == 4 and node(root, "brightness") == 500
+
+        # What the Brightness widget shows, and when the node can't be read
+        widget_ = types.SimpleNamespace(format="{percent:2.0%}", backlight=ramped)
+        assert Brightness._render(widget_) == "50%"
+        widget_.backlight = Backlight("missing", root=root)
+        assert Brightness._render(widget_) == "N/A"
+        print("5 steps in a frame: 1 write; ramp over 3 frames: 4 writes; ok")
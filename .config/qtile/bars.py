@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List
+
+from libqtile.config import Screen
+from libqtile.log_utils import logger
+
+Factory = Callable[[int], object]
+
+
+class BarPool:
+    """ Top bars per screen index, built when a screen first appears
+
+    A bar is created by factory(index) the first time a screen with that
+    index exists, and kept afterwards: unplugging a monitor leaves its bar
+    in the pool and plugging it back reuses it (qtile re-creates the bar
+    window only).
+    """
+
+    def __init__(self, factory: Factory) -> None:
+        self.factory = factory
+        self.bars: Dict[int, object] = {}
+        self.created = 0
+        self.reused = 0
+
+    def get(self, index: int):
+        bar = self.bars.get(index)
+        if bar is None:
+            bar = self.bars[index] = self.factory(index)
+            self.created += 1
+        return bar
+
+    def screens(self, count: int) -> List[Screen]:
+        """ Screens for the monitors connected at config load """
+        return [Screen(top=self.get(index)) for index in range(count)]
+
+    def ensure(self, qtile) -> None:
+        """ Give every connected output a Screen with its bar
+
+        Screens qtile finds beyond config.screens would be bare Screen()s,
+        so the missing ones are appended before qtile rebuilds its screens.
+        """
+        screens = qtile.config.screens
+        count = len(qtile.core.get_screen_info())
+        for index in range(len(qtile.screens), min(count, len(screens))):
+            if index in self.bars:
+                self.reused += 1
+        for index in range(len(screens), count):
+            screens.append(Screen(top=self.get(index)))
+            logger.info("Created the bar of screen %d", index)
+
+    def stats(self) -> dict:
+        return {"bars": len(self.bars), "created": self.created, "reused": self.reused}
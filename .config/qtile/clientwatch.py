@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Tuple
+
+Predicate = Callable[[object], bool]
+Callback = Callable[[object], None]
+
+
+class ClientWatcher:
+    """ Runs a callback once a client property becomes known, or gives up """
+
+    def __init__(self, timeout: float = 2.0) -> None:
+        self.timeout = timeout
+        self._pending: Dict[int, Tuple[Predicate, Callback, object]] = {}
+
+    def watch(self, client, predicate: Predicate, callback: Callback) -> None:
+        """ Call back right away if predicate holds, else on a later notify() """
+        if predicate(client):
+            callback(client)
+            return
+        self.forget(client)
+        handle = client.qtile.call_later(self.timeout, self._expire, client.wid)
+        self._pending[client.wid] = (predicate, callback, handle)
+
+    def notify(self, client) -> None:
+        """ Must be called on property changes (e.g. client_name_updated) """
+        entry = self._pending.get(client.wid)
+        if entry is None:
+            return
+        predicate, callback, handle = entry
+        if not predicate(client):
+            return
+        del self._pending[client.wid]
+        handle.cancel()
+        callback(client)
+
+    def forget(self, client) -> None:
+        entry = self._pending.pop(client.wid, None)
+        if entry is not None:
+            entry[2].cancel()
+
+    def _expire(self, wid: int) -> None:
+        self._pending.pop(wid, None)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+class Debouncer:
+    """ Coalesces bursts of events of a client into one call after a quiet delay """
+
+    def __init__(self, callback: Callback, delay: float = 0.15) -> None:
+        self.callback = callback
+        self.delay = delay
+        self._handles: Dict[int, object] = {}
+
+    def __call__(self, client) -> None:
+        handle = self._handles.get(client.wid)
+        if handle is not None:
+            handle.cancel()
+        self._handles[client.wid] = client.qtile.call_later(
+            self.delay, self._fire, client)
+
+    def _fire(self, client) -> None:
+        self._handles.pop(client.wid, None)
+        self.callback(client)
+
+    def forget(self, client) -> None:
+        handle = self._handles.pop(client.wid, None)
+        if handle is not None:
+            handle.cancel()
+
+
+class Transitions:
+    """ Remembers the last value seen per client, to react only on changes """
+
+    def __init__(self) -> None:
+        self._values: Dict[int, object] = {}
+
+    def changed(self, client, value) -> bool:
+        if client.wid in self._values and self._values[client.wid] == value:
+            return False
+        self._values[client.wid] = value
+        return True
+
+    def forget(self, client) -> None:
+        self._values.pop(client.wid, None)
+
+
+if __name__ == "__main__":
+    # Fake clients whose name arrives late, on a real event loop: python clientwatch.py
+    import asyncio
+    import time
+
+    class Qtile:
+        def call_later(self, delay, func, *args):
+            return asyncio.get_running_loop().call_later(delay, func, *args)
+
+    class Client:
+        qtile = Qtile()
+
+        def __init__(self, wid: int, name: str = "") -> None:
+            self.wid, self.name = wid, name
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        placed = {}
+        watcher = ClientWatcher(timeout=0.2)
+
+        def named(client):
+            return bool(client.name)
+
+        def place(client):
+            placed[client.wid] = time.perf_counter()
+
+        # Named when mapped: no delay, nothing pending
+        start = time.perf_counter()
+        watcher.watch(Client(1, "kitty"), named, place)
+        assert len(watcher) == 0
+        print(f"named window: placed after {(placed[1] - start) * 1000:.3f} ms")
+
+        # Name set 50 ms after mapping (Spotify): placed on the update
+        late = Client(2)
+        watcher.watch(late, named, place)
+        watcher.notify(late)  # unrelated property change: still waiting
+        named_at = []
+
+        def set_name():
+            late.name = "Spotify"
+            named_at.append(time.perf_counter())
+            watcher.notify(late)
+        loop.call_later(0.05, set_name)
+        await asyncio.sleep(0.1)
+        print(f"late name: placed {(placed[2] - named_at[0]) * 1000:.3f} ms after it arrived")
+
+        # Never named: given up after the timeout
+        watcher.watch(Client(3), named, place)
+        await asyncio.sleep(0.25)
+        assert 3 not in placed and len(watcher) == 0
+
+        # Closed while waiting: its timer is cancelled
+        closed = Client(4)
+        watcher.watch(closed, named, place)
+        watcher.forget(closed)
+        assert len(watcher) == 0
+        closed.name = "Spotify"
+        watcher.notify(closed)
+        assert 4 not in placed
+
+        # Bursts of title changes: one call after the quiet delay
+        calls = []
+        debounce = Debouncer(calls.append, delay=0.02)
+        client = Client(5, "a")
+        for _ in range(10):
+            debounce(client)
+        await asyncio.sleep(0.05)
+        assert calls == [client], calls
+        debounce(client)
+        debounce.forget(client)
+        await asyncio.sleep(0.05)
+        assert calls == [client], calls
+        print("timeout, forget and debounce: ok")
+
+    asyncio.run(main())
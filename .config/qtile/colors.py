@@ -1,24 +1,103 @@
 from __future__ import annotations
-from typing import Dict
+from functools import lru_cache
+from typing import Dict, Type
+
+
+class Color(tuple):
+    """ A colour parsed once into qtile's (r, g, b, alpha) form: 0-255 channels, 0-1 alpha """
+    __slots__ = ()
+
+    def __new__(cls, value: str) -> Color:
+        digits = value.lstrip("#")
+        if len(digits) not in (6, 8):
+            raise ValueError(f"Invalid colour {value!r}")
+        r, g, b = (int(digits[i:i + 2], 16) for i in (0, 2, 4))
+        alpha = int(digits[6:8], 16) / 255 if len(digits) == 8 else 1.0
+        return super().__new__(cls, (r, g, b, alpha))
+
+    @property
+    def hex(self) -> str:
+        """ Hex form, for the few places qtile only accepts strings (X11 borders) """
+        r, g, b, alpha = self
+        text = f"#{r:02x}{g:02x}{b:02x}"
+        return text if alpha == 1.0 else f"{text}{round(alpha * 255):02x}"
+
+    def __repr__(self) -> str:
+        return f"Color({self.hex!r})"
+
+
+class Frozen:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class ColorPair(Frozen):
+    __slots__ = ("fg", "bg")
+
+    def __init__(self, fg: str, bg: str) -> None:
+        object.__setattr__(self, "fg", Color(fg))
+        object.__setattr__(self, "bg", Color(bg))
 
 
 class Colors:
+    """ Foreground/background pair as written in the palettes below """
     def __init__(self, fg: str, bg: str) -> None:
         self.fg = fg
         self.bg = bg
 
 
-class Theme():
-    wifi: Colors
-    audio: Colors
-    battery: Colors
-    calendar: Colors
-    ram: Colors
-    window_count: Colors
-    current_layout: Colors
+# Pairs read by config.py (.fg/.bg)
+PAIRS = (
+    "audio", "bar", "battery", "battery_low", "check_updates", "chord",
+    "clipboard", "clock", "cpu_graph", "current_layout", "ram", "spotify",
+    "wifi", "window_count",
+)
+
+# Single colours read by config.py
+SIMPLE = (
+    "groupbox_active", "groupbox_inactive", "groupbox_this_current",
+    "groupbox_this", "groupbox_other_current", "groupbox_other",
+    "window_focused_border", "window_border",
+)
 
 
-class Dracula(Theme):
+class Theme(Frozen):
+    """ A palette compiled once: every colour pre-parsed, no attribute can change """
+    __slots__ = ("name",) + PAIRS + SIMPLE
+
+    def __init__(self, name: str, palette: type) -> None:
+        validate(palette)
+        object.__setattr__(self, "name", name)
+        for attr in PAIRS:
+            pair = getattr(palette, attr)
+            object.__setattr__(self, attr, ColorPair(pair.fg, pair.bg))
+        for attr in SIMPLE:
+            object.__setattr__(self, attr, Color(getattr(palette, attr)))
+
+    def __iter__(self):
+        """ Yield (attribute path, colour), e.g. ("bar.bg", Color(...)) """
+        for attr in PAIRS:
+            pair = getattr(self, attr)
+            yield f"{attr}.fg", pair.fg
+            yield f"{attr}.bg", pair.bg
+        for attr in SIMPLE:
+            yield attr, getattr(self, attr)
+
+
+def validate(palette: type) -> None:
+    """ Check a palette defines every colour config.py reads """
+    missing = [attr for attr in PAIRS + SIMPLE if not hasattr(palette, attr)]
+    if missing:
+        raise ValueError(f"Theme {palette.__name__} misses: {', '.join(missing)}")
+
+
+class Palette:
+    """ Base of the palettes: plain hex strings, compiled by get_theme() """
+
+
+class Dracula(Palette):
     BASIC_BLACK       = "#000000"
     BASIC_WHITE       = "#FFFFFF"
     GREY              = "#44475A50"
@@ -71,7 +150,7 @@ class Dracula(Theme):
     window_focused_border   = BRIGHT_BLUE
     window_border           = BLACK
 
-class Catppuccin(Theme):
+class Catppuccin(Palette):
     BASIC_BLACK       = "#000000"
     BASIC_WHITE       = "#FFFFFF"
     GREY              = "#5b607850"
@@ -114,10 +193,23 @@ class Catppuccin(Theme):
     window_focused_border   = PURPLE
     window_border   = BLACK
 
-THEMES : Dict[str, Theme] = {
-    "dracula": Dracula(),
-    "catppuccin": Catppuccin()
+THEMES: Dict[str, Type[Palette]] = {
+    "dracula": Dracula,
+    "catppuccin": Catppuccin
 }
 
+@lru_cache(maxsize=None)
+def _compile(theme_name: str) -> Theme:
+    return Theme(theme_name, THEMES[theme_name])
+
+
 def get_theme(theme_name: str) -> Theme:
-    return THEMES.get(theme_name, Dracula()) 
+    """ Compile a theme the first time it is asked for (unknown names get dracula) """
+    return _compile(theme_name if theme_name in THEMES else "dracula")
+
+
+if __name__ == "__main__":
+    # Validate every theme: python colors.py
+    for name in THEMES:
+        get_theme(name)
+    print(f"{len(THEMES)} themes OK")
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import shlex
+import time
+from typing import Dict, List, Optional, Tuple
+
+from libqtile.lazy import lazy
+from libqtile.log_utils import logger
+
+from timeline import TRACER
+
+REPORT_PATH = os.path.expanduser("~/.cache/qtile/spawn-latency.json")
+# Upper bounds (ms) of the histogram buckets; the last one catches the rest
+BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+# Launches whose window never showed up are forgotten after this (s)
+MAP_TIMEOUT = 30
+# How far up the process tree a window's pid is searched (script -> rofi)
+MAX_ANCESTORS = 4
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "worst")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS_MS)
+        self.total = 0
+        self.worst = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.worst = max(self.worst, ms)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "worst_ms": round(self.worst, 2),
+            "buckets": {("+inf" if b == float("inf") else f"<={b}ms"): c
+                        for b, c in zip(BUCKETS_MS, self.counts)},
+        }
+
+
+class Command:
+    """ A command pre-parsed into argv, with its launch latencies """
+
+    __slots__ = ("name", "argv", "to_start", "to_map")
+
+    def __init__(self, name: str, argv: List[str]) -> None:
+        self.name = name
+        self.argv = argv
+        self.to_start = Histogram()  # keypress -> process started
+        self.to_map = Histogram()  # keypress -> first window mapped
+
+    def config_fingerprint(self) -> tuple:
+        """ What incremental reloads compare: not the latencies """
+        return (self.name, self.argv)
+
+
+def parse(cmd: str) -> List[str]:
+    """ Split a command line into argv; a trailing '&' is meaningless without a shell """
+    argv = shlex.split(cmd)
+    if argv and argv[-1] == "&":
+        argv.pop()
+    return [os.path.expanduser(arg) for arg in argv]
+
+
+def parent_pid(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # pid (comm) state ppid ... (comm may contain spaces)
+            return int(f.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class CommandRegistry:
+    """ Commands exec'd without /bin/sh, timing each launch """
+
+    def __init__(self) -> None:
+        self.commands: Dict[str, Command] = {}
+        self._launches: Dict[int, Tuple[Command, float]] = {}
+
+    def register(self, cmd: str) -> Command:
+        command = self.commands.get(cmd)
+        if command is None:
+            argv = parse(cmd)
+            name = " ".join([os.path.basename(argv[0]), *argv[1:]])
+            command = self.commands[cmd] = Command(name, argv)
+        return command
+
+    def spawn(self, cmd: str):
+        """ lazy.spawn replacement: argv parsed once, here at config load """
+        command = self.register(cmd)
+
+        def _inner(qtile):
+            self.run(qtile, command)
+        return lazy.function(_inner)
+
+    def run(self, qtile, command: Command) -> None:
+        pressed = time.perf_counter()
+        pid = qtile.cmd_spawn(command.argv)  # qtile 0.22 API, like the rest of the config
+        started = time.perf_counter()
+        command.to_start.add((started - pressed) * 1000)
+        TRACER.complete(command.name, "spawn", pressed, started, argv=command.argv, pid=pid)
+        if isinstance(pid, int) and pid > 0:
+            self._launches[pid] = (command, pressed)
+
+    def window_mapped(self, client) -> None:
+        """ Record keypress -> first window for launches this client comes from """
+        if not self._launches:
+            return
+        now = time.perf_counter()
+        for pid, (_, pressed) in list(self._launches.items()):
+            if now - pressed > MAP_TIMEOUT:
+                del self._launches[pid]
+
+        pid = client.get_pid()
+        for _ in range(MAX_ANCESTORS):
+            if pid is None or pid <= 1:
+                return
+            launch = self._launches.pop(pid, None)
+            if launch is not None:
+                command, pressed = launch
+                command.to_map.add((now - pressed) * 1000)
+                TRACER.complete(f"{command.name} (window)", "spawn", pressed, now,
+                                window=client.name)
+                self.export()
+                return
+            pid = parent_pid(pid)
+
+    def export(self, path: str = REPORT_PATH) -> None:
+        report = {command.name: {"argv": command.argv,
+                                 "to_start": command.to_start.to_dict(),
+                                 "to_map": command.to_map.to_dict()}
+                  for command in self.commands.values()}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        except OSError:
+            logger.exception("Could not write %s", path)
+
+
+# reload_config() re-imports this module: keep the running registry, so
+# launch latencies accumulate across reloads
+COMMANDS = globals().get("COMMANDS") or CommandRegistry()
+spawn = COMMANDS.spawn
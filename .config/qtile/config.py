@@ -22,25 +22,48 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import asyncio
 import os
-import subprocess
 from typing import List
 
 from libqtile import bar, hook, layout, qtile, widget
 from libqtile.config import (Click, Drag, DropDown, Group, Key, KeyChord,
-                             Match, ScratchPad, Screen)
+                             Match, ScratchPad)
 from libqtile.core.manager import Qtile
 from libqtile.lazy import lazy
+from libqtile.log_utils import logger
 from libqtile.utils import guess_terminal
 
+import audio
+import backlight
+import frames
+import incremental
+import profiler
+import sampler
+import themeswap
+import updates
+from audio import toggle_mic_mute, toggle_mute, volume_step
+from autostart import Autostart, Task
+from backlight import Backlight, brightness_step
+from bars import BarPool
+from clientwatch import ClientWatcher, Debouncer, Transitions
+from commands import COMMANDS, spawn
 from colors import get_theme
+from instrument import HOOKS, KEYS, time_keys, timed_hook
+from monitors import CACHE as MONITORS_CACHE
+from monitors import get_monitors
+from notify import NOTIFIER
+from routing import AFFINITY, go_to_group, route_window, show_group
+from rules import RuleIndex
+from sampler import SAMPLER
+from timeline import TRACER
 
 ###################################################################################################
 # GLOBALS #########################################################################################
 
-colors = get_theme("dracula")
-#colors = get_theme("catppuccin")
+profiler.begin()
+profiler.mark("theme")
+colors = get_theme(themeswap.active("dracula"))
+#colors = get_theme(themeswap.active("catppuccin"))
 
 # Globals
 WIDGET_FONT = "Font Awesome 6 Bold"
@@ -62,13 +85,12 @@ UNICODE_CPU = ""
 
 # Scripts
 HOME = os.path.expanduser('~')
-SCRIPT_AUTOSTART = f'{HOME}/.config/qtile/autostart.sh'
-SCRIPT_POWER_MENU = f"{HOME}/.config/rofi/powermenu.sh &" 
-SCRIPT_APP_MENU = f"{HOME}/.config/rofi/launcher.sh &" 
-SCRIPT_OPEN_IN_QUTEBROWSER = f"{HOME}/.config/rofi/open-in-qutebrowser.sh &"
-SCRIPT_OPEN_PROJECT = f"{HOME}/.config/rofi/open-project.sh &"
-SCRIPT_CALC = f"{HOME}/.config/rofi/calc.sh &" 
-SCRIPT_EMOJI = f"{HOME}/.config/rofi/emoji.sh &" 
+SCRIPT_POWER_MENU = f"{HOME}/.config/rofi/powermenu.sh"
+SCRIPT_APP_MENU = f"{HOME}/.config/rofi/launcher.sh"
+SCRIPT_OPEN_IN_QUTEBROWSER = f"{HOME}/.config/rofi/open-in-qutebrowser.sh"
+SCRIPT_OPEN_PROJECT = f"{HOME}/.config/rofi/open-project.sh"
+SCRIPT_CALC = f"{HOME}/.config/rofi/calc.sh"
+SCRIPT_EMOJI = f"{HOME}/.config/rofi/emoji.sh"
 SCRIPT_WALLPAPER = f"{HOME}/.fehbg"
 
 # Commands
@@ -83,21 +105,34 @@ CMD_MONITOR_ONLYNOTEBOOK = "autorandr --change onlynotebook"
 CMD_MONITOR_ONLYEXTERNAL = "autorandr --change onlyexternal"
 CMD_MONITOR_DUAL = "autorandr --change dualmonitor"
 
-CMD_BRIGHTNESS_UP = 'brightnessctl set 5%+'
-CMD_BRIGHTNESS_DOWN = 'brightnessctl set 5%-'
+# Brightness is written directly to /sys/class/backlight/BACKLIGHT_NAME
+BACKLIGHT = Backlight(BACKLIGHT_NAME)
+BRIGHTNESS_STEP = 5
 
-CMD_AUDIO_MIC_MUTE = 'pactl set-source-mute @DEFAULT_SOURCE@ toggle'
-CMD_AUDIO_MUTE_UNMUTE = 'pactl set-sink-mute @DEFAULT_SINK@ toggle'
-CMD_AUDIO_UP = 'pactl set-sink-volume @DEFAULT_SINK@ +2%'
-CMD_AUDIO_DOWN = 'pactl set-sink-volume @DEFAULT_SINK@ -2%'
+# Audio goes through audio.AUDIO (one persistent PulseAudio/PipeWire connection)
+AUDIO_STEP = 2
 
 ###################################################################################################
 # Utils functions #################################################################################
 
 
-def send_notification(title: str = "Message", msg: str = "", expire=2000):
-    """ Return a notfication command """
-    return f"notify-send '{title}' '{msg}' --expire-time={expire}"
+def send_notification(title: str = "Message", msg: str = "", expire=2000, tag=None):
+    """ Return a lazy notification (notifications with the same tag replace each other) """
+    return lazy.function(lambda qtile: NOTIFIER.send(title, msg, expire, tag))
+
+
+def show_render_stats(qtile):
+    """ Log the bar frame, sampler and bar pool counters and notify a summary """
+    stats = {"frames": frames.stats(), "sampler": SAMPLER.stats(), "bars": BARS.stats()}
+    logger.warning("Render stats: %s", stats)
+    fps = ", ".join(f"{name} {s['frames_per_second']}" for name, s in stats["frames"].items())
+    sampler = stats["sampler"]
+    NOTIFIER.send("Render stats", "\n".join([
+        f"Frames/s: {fps or 'no bars'}",
+        f"Sampler: {sampler['polls']} polls, {sampler['skipped']} skipped, "
+        f"{sampler['suspended']}/{sampler['subscribers']} suspended",
+        f"Bars: {stats['bars']['created']} created, {stats['bars']['reused']} reused",
+    ]), expire=8000, tag="render-stats")
 
 
 def bold(text: str):
@@ -105,27 +140,7 @@ def bold(text: str):
     return f'<b>{text}</b>'
 
 
-def go_to_group(name: str):
-    """ Go to group but keeping it predefined screen """
-    def _inner(qtile):
-        if len(qtile.screens) == 1:
-            qtile.groups_map[name].cmd_toscreen()
-            return
-        if name in '789':
-            qtile.focus_screen(1)
-            qtile.groups_map[name].cmd_toscreen()
-        else:
-            qtile.focus_screen(0)
-            qtile.groups_map[name].cmd_toscreen()
-    return _inner
-
-
-def get_monitors():
-    """ Get number of connected monitors """
-    xr = subprocess.check_output(
-        'xrandr --query | grep " connected"', shell=True).decode().split('\n')
-    monitors = len(xr) - 1 if len(xr) > 2 else len(xr)
-    return monitors
+profiler.mark("monitors")
 MONITORS = get_monitors()
 
 @lazy.function
@@ -146,6 +161,7 @@ ALT = "mod1"
 TERMINAL = "kitty"
 # TERMINAL = guess_terminal()
 
+profiler.mark("keys")
 keys = [
 
     Key([SUPER, "control"], "q",
@@ -153,11 +169,15 @@ keys = [
         desc="Shutdown Qtile"),
 
     Key([SUPER, "control"], "r",
+        lazy.function(incremental.reload_changes),
+        desc="Reload what changed in the config"),
+
+    Key([SUPER, "control", "shift"], "r",
         lazy.reload_config(),
-        desc="Reload the config"),
+        desc="Reload the whole config"),
 
     Key([SUPER], "Return",
-        lazy.spawn(TERMINAL),
+        spawn(TERMINAL),
         desc="Launch terminal"),
 
     Key([SUPER], "Tab",
@@ -170,27 +190,27 @@ keys = [
 
     # Laptop keys
     Key([], "XF86MonBrightnessUp", 
-        lazy.spawn(CMD_BRIGHTNESS_UP), 
+        lazy.function(brightness_step(BACKLIGHT, +BRIGHTNESS_STEP)),
         desc='Increase brightness'),
 
     Key([], "XF86MonBrightnessDown", 
-        lazy.spawn(CMD_BRIGHTNESS_DOWN), 
+        lazy.function(brightness_step(BACKLIGHT, -BRIGHTNESS_STEP)),
         desc='Decrease brightness'),
 
     Key([], "XF86AudioMicMute", 
-        lazy.spawn(CMD_AUDIO_MIC_MUTE), 
+        lazy.function(toggle_mic_mute),
         desc='Mute microphone'),
 
     Key([], "XF86AudioMute", 
-        lazy.spawn(CMD_AUDIO_MUTE_UNMUTE),
+        lazy.function(toggle_mute),
         desc='Mute audio'),
 
     Key([], "XF86AudioRaiseVolume",
-        lazy.spawn(CMD_AUDIO_UP),
+        lazy.function(volume_step(+AUDIO_STEP)),
         desc='Increase audio volume'),
 
     Key([], "XF86AudioLowerVolume", 
-        lazy.spawn(CMD_AUDIO_DOWN), 
+        lazy.function(volume_step(-AUDIO_STEP)),
         desc='Decrease audio volume'),
 
     # Move focus
@@ -238,50 +258,68 @@ keys = [
     
     # Launchers
     Key([SUPER], "space",
-        lazy.spawn(SCRIPT_APP_MENU),
+        spawn(SCRIPT_APP_MENU),
         desc="Launch app menu"),
  
     Key([SUPER], "e", 
-        lazy.spawn(CMD_FILE_MANAGER),
+        spawn(CMD_FILE_MANAGER),
         desc="Open a file manager"),
 
     Key([], "Print",
-        lazy.spawn(CMD_SCREENSHOT),
+        spawn(CMD_SCREENSHOT),
         desc='Launch screenshot'),
 
     # Menus
     Key([SUPER], "q", 
-        lazy.spawn(SCRIPT_OPEN_IN_QUTEBROWSER), 
+        spawn(SCRIPT_OPEN_IN_QUTEBROWSER), 
         desc="Open qutebrowser shortcut"),
 
     Key([SUPER], "o", 
-        lazy.spawn(SCRIPT_OPEN_PROJECT), 
+        spawn(SCRIPT_OPEN_PROJECT), 
         desc="Open projects menu (A custom script for open a dir in a text editor)"),
 
     Key([SUPER], "p",
-        lazy.spawn(SCRIPT_POWER_MENU),
+        spawn(SCRIPT_POWER_MENU),
         desc="Launch power menu"),
 
     Key([SUPER], "c",
-        lazy.spawn(SCRIPT_CALC),
+        spawn(SCRIPT_CALC),
         desc="Launch calculator"),
 
     Key([SUPER, "shift"], "Equal",
-        lazy.spawn(SCRIPT_EMOJI),
+        spawn(SCRIPT_EMOJI),
         desc="Launch emoji list"),
 
     # Settings
     Key([SUPER], "b",
         lazy.hide_show_bar(position="top"),
+        lazy.function(lambda qtile: SAMPLER.refresh()),  # resume the widgets shown
         desc="Toggle bar"),
 
+    Key([SUPER, "control"], "t",
+        lazy.function(themeswap.cycle_theme),
+        desc="Switch to the next color theme (without reloading)"),
+
+    Key([SUPER, "control"], "s",
+        lazy.function(HOOKS.show),
+        lazy.function(KEYS.show),
+        desc="Show the slowest hooks and keybindings"),
+
+    Key([SUPER, "control"], "i",
+        lazy.function(show_render_stats),
+        desc="Show bar frame, sampler and bar pool counters"),
+
+    Key([SUPER, "control"], "p",
+        lazy.function(TRACER.toggle),
+        desc="Start/stop recording a trace (chrome://tracing, Perfetto)"),
+
     Key([SUPER], "0", 
-        lazy.spawn(CMD_REMAP_CAPS), 
+        spawn(CMD_REMAP_CAPS), 
         desc="Remap caps to act as super"),
 
     Key([SUPER, 'control'], 'w',
-        lazy.spawn(SCRIPT_WALLPAPER),
-        lazy.spawn(send_notification("Screens", "Wallpaper fixed", 4000)),
+        spawn(SCRIPT_WALLPAPER),
+        send_notification("Screens", "Wallpaper fixed", 4000, tag="screens"),
         desc='Update wallpaper (Used when screen layout change and the wallpaper brake)'),
 
     Key([SUPER], "f", 
@@ -290,20 +328,18 @@ keys = [
 
     # Settings / Screen layout
     Key([SUPER, 'control'], '0',
-        lazy.spawn(CMD_MONITOR_ONLYNOTEBOOK),
-        lazy.spawn(
-            send_notification("Screens", "Using only notebook screen", 4000)),
+        spawn(CMD_MONITOR_ONLYNOTEBOOK),
+        send_notification("Screens", "Using only notebook screen", 4000, tag="screens"),
         desc='Use only notebook screen'),
 
     Key([SUPER, 'control'], '1',
-        lazy.spawn(CMD_MONITOR_ONLYEXTERNAL),
-        lazy.spawn(
-            send_notification("Screens", "Using only external screen", 4000)),
+        spawn(CMD_MONITOR_ONLYEXTERNAL),
+        send_notification("Screens", "Using only external screen", 4000, tag="screens"),
         desc='Use only external screen'),
 
     Key([SUPER, 'control'], '2',
-        lazy.spawn(CMD_MONITOR_DUAL),
-        lazy.spawn(send_notification("Screens", "Using both screens", 4000)),
+        spawn(CMD_MONITOR_DUAL),
+        send_notification("Screens", "Using both screens", 4000, tag="screens"),
         desc='Use both screens, notebook and external'),
 
     # Settings Menu
@@ -311,19 +347,19 @@ keys = [
 
         # Audio submenu
         KeyChord([], "a", [
-            Key([], "j", lazy.spawn(CMD_AUDIO_DOWN)),
-            Key([], "k", lazy.spawn(CMD_AUDIO_UP)),
-            Key([], "m", lazy.spawn(CMD_AUDIO_MUTE_UNMUTE))
+            Key([], "j", lazy.function(volume_step(-AUDIO_STEP))),
+            Key([], "k", lazy.function(volume_step(+AUDIO_STEP))),
+            Key([], "m", lazy.function(toggle_mute))
         ], mode='Audio'),
 
         # Brightness submenu
         KeyChord([], "b", [
-            Key([], "j", lazy.spawn(CMD_BRIGHTNESS_DOWN)),
-            Key([], "k", lazy.spawn(CMD_BRIGHTNESS_UP))
+            Key([], "j", lazy.function(brightness_step(BACKLIGHT, -BRIGHTNESS_STEP))),
+            Key([], "k", lazy.function(brightness_step(BACKLIGHT, +BRIGHTNESS_STEP)))
         ], mode='Brightness'),
 
         # Wi-fi submenu
-        Key([], "w", lazy.spawn(CMD_WIFI_MENU)),
+        Key([], "w", spawn(CMD_WIFI_MENU)),
 
     ], mode='Settings'),
 
@@ -333,6 +369,7 @@ keys = [
 # Groups - Workspaces
 # Obs.: Group Keys MUST be in the same lenght as groups
 
+profiler.mark("groups")
 groups: List[Group] = [
         Group("1", label=" ₁", layout="monadtall", matches=[Match(wm_class="Firefox"), Match(wm_class="qutebrowser")]),
         Group("2", label=" ₂", layout="max", matches=[Match(title="nvim")]),
@@ -345,6 +382,24 @@ groups: List[Group] = [
         Group("9", label=" ₉", layout="max", matches=[]), 
 ]
 
+# Group matches compiled once, used by the hooks to find a window's group
+GROUP_RULES = RuleIndex((m, group.name) for group in groups for m in group.matches)
+
+# Groups shown on the secondary screens when there is more than one monitor
+SECONDARY_GROUPS = "789"
+AFFINITY.configure({1: SECONDARY_GROUPS})
+
+
+def visible_groups(index: int, count: int) -> List[str]:
+    """ Groups the GroupBox of screen index shows, given the number of screens """
+    names = [g.name for g in groups if not isinstance(g, ScratchPad)]
+    if count == 1:
+        return names
+    if index == 0:
+        return [name for name in names if name not in SECONDARY_GROUPS]
+    return [name for name in names if name in SECONDARY_GROUPS]
+
+
 for group in groups:
 
     keys.append(
@@ -372,15 +427,20 @@ keys.extend([
     Key([SUPER], "t", lazy.group["scratchpad"].dropdown_toggle('todo'))
 ])
 
+# Time every binding (chords and group keys included), see Super+Ctrl+S
+time_keys(keys)
+
 
 ###############################################################################
 # Layouts
 
+profiler.mark("layouts")
+
 # Default params for layouts
 layout_theme = dict(
     border_width=2,
-    border_focus=colors.window_focused_border,
-    border_normal=colors.window_border,
+    border_focus=colors.window_focused_border.hex,
+    border_normal=colors.window_border.hex,
     margin=8,
     padding=2)
 
@@ -392,6 +452,13 @@ layouts = [
 ###############################################################################
 # Widgets
 
+profiler.mark("widgets")
+widget = profiler.timed_widgets(widget)
+sampler = profiler.timed_widgets(sampler)
+updates = profiler.timed_widgets(updates)
+audio = profiler.timed_widgets(audio)
+backlight = profiler.timed_widgets(backlight)
+
 widget_defaults = dict(
     font=WIDGET_FONT,
     fontsize=11,
@@ -403,7 +470,7 @@ icons_defaults = dict(
     padding=0)
  
 
-groupbox_main = widget.GroupBox(
+groupbox_style = dict(
     active=colors.groupbox_active,
     inactive=colors.groupbox_inactive,
     this_screen_border=colors.groupbox_this,
@@ -413,26 +480,12 @@ groupbox_main = widget.GroupBox(
     highlight_method='block',
     disable_drag=True,
     hide_unused=True,
-    borderwidth=3,
-    **widget_defaults)
+    borderwidth=3)
 
-groupbox_secondary = widget.GroupBox(
-    active=colors.groupbox_active,
-    inactive=colors.groupbox_inactive,
-    this_screen_border=colors.groupbox_this,
-    other_screen_border=colors.groupbox_other,
-    this_current_screen_border=colors.groupbox_this_current,
-    other_current_screen_border=colors.groupbox_other_current,
-    highlight_method='block',
-    disable_drag=True,
-    hide_unused=True,
-    borderwidth=3,
-    visible_groups=[
-        groups[6].name,
-        groups[7].name,
-        groups[8].name
-    ],
-    **widget_defaults)
+groupbox_main = widget.GroupBox(**groupbox_style, **widget_defaults)
+
+# GroupBox of each secondary screen, by screen index (see make_bar)
+groupboxes_secondary = {}
 
 main_top_widgets = [
     
@@ -489,7 +542,7 @@ main_top_widgets = [
     widget.Spacer(),
 
     # CPU
-    widget.WidgetBox(
+    sampler.WidgetBox(
         text_closed="  ",
         fontsize=14,
         close_button_location="right",
@@ -500,11 +553,11 @@ main_top_widgets = [
                 background=colors.cpu_graph.bg,
                 foreground=colors.cpu_graph.fg,
                 **icons_defaults),
-            widget.CPU(
+            sampler.CPU(
                 background=colors.cpu_graph.bg,
                 foreground=colors.cpu_graph.fg,
             ),
-            widget.CPUGraph(
+            sampler.CPUGraph(
                 type='line',
                 background=colors.cpu_graph.bg,
                 border_color=colors.cpu_graph.fg,
@@ -523,13 +576,13 @@ main_top_widgets = [
                 background=colors.ram.bg,
                 foreground=colors.ram.fg,
                 **icons_defaults),
-            widget.Memory(
+            sampler.Memory(
                 format='{MemUsed: .3f}{mm} / {MemTotal: .3f}{mm}',
                 measure_mem='G',
                 background=colors.ram.bg,
                 foreground=colors.ram.fg,
                 **widget_defaults),
-            widget.MemoryGraph(
+            sampler.MemoryGraph(
                 type='line',
                 background=colors.ram.bg,
                 border_color=colors.ram.fg,
@@ -543,7 +596,7 @@ main_top_widgets = [
 
     widget.Spacer(10),
 
-    widget.CheckUpdates(
+    updates.CheckUpdates(
         display_format=bold(UNICODE_UPDATES + " {updates} updates"),
         colour_have_updates=colors.check_updates.fg,
         background=colors.check_updates.bg,
@@ -559,12 +612,12 @@ main_top_widgets = [
         background=colors.wifi.bg,
         foreground=colors.wifi.fg,
         **icons_defaults),
-    widget.Wlan(
+    sampler.Wlan(
         format='{percent:2.0%}',
         background=colors.wifi.bg,
         foreground=colors.wifi.fg,
         mouse_callbacks={
-            "Button1": lazy.spawn(CMD_WIFI_MENU)
+            "Button1": spawn(CMD_WIFI_MENU)
         },
         **widget_defaults),
 
@@ -575,14 +628,27 @@ main_top_widgets = [
         background=colors.audio.bg, 
         foreground=colors.audio.fg,
         **icons_defaults),
-    widget.Volume(
+    audio.Volume(
         background=colors.audio.bg,
         foreground=colors.audio.fg, 
         **widget_defaults),
 
+    widget.Spacer(15),
+
+    widget.TextBox(
+        bold(UNICODE_BRIGHTNESS),
+        background=colors.audio.bg,
+        foreground=colors.audio.fg,
+        **icons_defaults),
+    backlight.Brightness(
+        backlight=BACKLIGHT,
+        background=colors.audio.bg,
+        foreground=colors.audio.fg,
+        **widget_defaults),
+
     widget.Spacer(5),
 
-    widget.Battery(
+    sampler.Battery(
         background=colors.battery.bg,
         foreground=colors.battery.fg,
         low_background=colors.battery_low.bg,
@@ -602,23 +668,30 @@ main_top_widgets = [
         background=colors.clock.bg,
         foreground=colors.clock.fg,
         mouse_callbacks={
-            "Button1": lazy.spawn(CMD_OPEN_CALENDAR)
+            "Button1": spawn(CMD_OPEN_CALENDAR)
         }),
 
     widget.Spacer(10),
 
 ]  # main_top_widgets END
 
-secondary_widgets = [
-    widget.Spacer(10),
-    widget.CurrentLayoutIcon(
-        background=colors.current_layout.bg,
-        foreground=colors.current_layout.fg,
-        scale=0.8,
-        **widget_defaults),
-    groupbox_secondary,
-    widget.Spacer(),
-]
+def secondary_widgets(index: int) -> list:
+    """ Widgets of the bar of a secondary screen (each screen gets its own) """
+    groupbox = widget.GroupBox(
+        visible_groups=visible_groups(index, max(2, MONITORS_CACHE.count())),
+        **groupbox_style,
+        **widget_defaults)
+    groupboxes_secondary[index] = groupbox
+    return [
+        widget.Spacer(10),
+        widget.CurrentLayoutIcon(
+            background=colors.current_layout.bg,
+            foreground=colors.current_layout.fg,
+            scale=0.8,
+            **widget_defaults),
+        groupbox,
+        widget.Spacer(),
+    ]
 
 bottom_widgets = [
     widget.WindowName(),
@@ -628,75 +701,159 @@ bottom_widgets = [
 ###############################################################################
 # Screen and monitors
 
+profiler.mark("bars")
 bar_style = dict(
     background=colors.bar.bg,
-    border_color=colors.bar.bg,
+    border_color=colors.bar.bg.hex,
     margin=[5, 10, 0, 10],
     border_width=2)
 
 main_bar = bar.Bar(widgets=main_top_widgets, size=23, **bar_style)
-secondary_bar = bar.Bar(widgets=secondary_widgets, size=23, **bar_style)
 
-screens = []
-for monitor in range(MONITORS):
 
-    if monitor == 0:
-        # Primary monitor
-        screens.append(Screen(top=main_bar))
+def make_bar(index: int) -> bar.Bar:
+    """ Top bar of screen index; secondary bars are only built once their screen shows up """
+    if index == 0:
+        return main_bar
+    return bar.Bar(widgets=secondary_widgets(index), size=23, **bar_style)
+
+
+BARS = BarPool(make_bar)
+screens = BARS.screens(MONITORS)
 
-    else:
-        # Secondary monitors
-        screens.append(Screen(top=secondary_bar))
+profiler.finish()
 
 ###################################################################################################
 # Hooks ###########################################################################################
+@hook.subscribe.screen_change
+@timed_hook
+def prepare_screens(event):
+    """ Build the bars of new monitors before qtile reconfigures its screens """
+    BARS.ensure(qtile)
+
+
 @hook.subscribe.screens_reconfigured
+@timed_hook
 def reconfigure_groupbox():
     """ Adapt visible groups depending on number of screens """
-    groups_names = [g.name for g in qtile.groups]
-    if len(qtile.screens) > 1:
-        groupbox_main.visible_groups = groups_names[0:6]
-    else:
-        groupbox_main.visible_groups = groups_names
+    MONITORS_CACHE.update(len(qtile.screens))
+    count = len(qtile.screens)
+    groupbox_main.visible_groups = visible_groups(0, count)
+    for index, groupbox in groupboxes_secondary.items():
+        groupbox.visible_groups = visible_groups(index, count)
 
 
 @hook.subscribe.startup
+@timed_hook
 def startup():
     """ Execute some steps in qtile refresh """
     reconfigure_groupbox()
 
+@hook.subscribe.startup
+@hook.subscribe.screens_reconfigured
+@timed_hook
+def schedule_bar_frames():
+    """ Coalesce widget draws into one paint per bar per frame """
+    frames.attach_all(qtile)
+
+# Programs started at login; each one starts as soon as those it comes after are done
+AUTOSTART = Autostart([
+    Task("numlockx", ["numlockx", "on"]),
+    Task("setxkbmap", ["setxkbmap", "-option", "caps:super"]),  # Remap caps to super
+    Task("autorandr", ["autorandr", "--change"]),
+    Task("wallpaper", ["~/.fehbg"], after=("autorandr",)),
+    Task("welcome", ["notify-send", "Welcome, IgorTxra"]),
+    Task("udiskie", ["udiskie"], daemon=True),
+    Task("projects", ["~/.config/rofi/projects.py", "watch"], daemon=True),  # open-project index
+    Task("picom", ["picom"], daemon=True),
+])
+
+
 @hook.subscribe.startup_once
-def autostart():
-    """ Executes a script on qtile startup """
-    subprocess.Popen([SCRIPT_AUTOSTART])
+@timed_hook
+async def autostart():
+    """ Start the session programs on qtile startup, in parallel """
+    await AUTOSTART.run(qtile)
 
 
-@hook.subscribe.client_new
-async def move_spotify(client):
-    """ Move spotify window to its group """
-    await asyncio.sleep(0.1)
+# Clients mapped without a title, waiting for it (e.g. Spotify sets it late)
+CLIENT_WATCHER = ClientWatcher(timeout=2.0)
+
+# Last group each client matched, so title changes only route on a new match
+GROUP_MATCHES = Transitions()
+
+
+def _move_if_spotify(client):
     if 'Spotify' in client.name:
-        client.qtile.cmd_simulate_keypress([SUPER, "shift"], "8")
+        route_window(client, "8")
 
 
 @hook.subscribe.client_new
+def trace_client_new(client):
+    """ Mark new windows on the trace timeline (no-op unless tracing) """
+    TRACER.instant("client_new", "client", name=client.name)
+
+
+@hook.subscribe.client_name_updated
+def trace_client_name(client):
+    TRACER.instant("client_name_updated", "client", name=client.name)
+
+
+@hook.subscribe.client_new
+@timed_hook
+def record_spawn_latency(client):
+    """ Time from the launcher keypress to its first window """
+    COMMANDS.window_mapped(client)
+
+
+@hook.subscribe.client_new
+@timed_hook
+def move_spotify(client):
+    """ Move spotify window to its group as soon as its title is known """
+    CLIENT_WATCHER.watch(client, lambda c: bool(c.name), _move_if_spotify)
+
+
+@hook.subscribe.client_name_updated
+@timed_hook
+def notify_client_watcher(client):
+    """ Let clients waiting for a title react to the new one """
+    CLIENT_WATCHER.notify(client)
+
+
+@hook.subscribe.client_new
+@timed_hook
 def modify_window(client):
     """ Focus in the group where the new client will be moved by Match """
-    for group in groups:  # follow on auto-move
-        match = next((m for m in group.matches if m.compare(client)), None)
-        if match:
-            # A way to call go_to_group() because its impossible call directly
-            client.qtile.cmd_simulate_keypress([SUPER], group.name)
+    group_name = GROUP_RULES.lookup(client)
+    GROUP_MATCHES.changed(client, group_name)
+    if group_name is not None:  # follow on auto-move
+        show_group(client.qtile, group_name)
+
+
+def _route_on_match_change(client):
+    group_name = GROUP_RULES.lookup(client)
+    if GROUP_MATCHES.changed(client, group_name) and group_name is not None:
+        route_window(client, group_name)
+
+
+# Terminals/editors retitle many times per second: wait for a quiet title
+route_on_new_title = Debouncer(_route_on_match_change, delay=0.15)
 
 
 @hook.subscribe.client_name_updated
+@timed_hook
 def move_to_a_match_a_group(client):
     """ Focus in the group where the new client will be moved by Match when client name changes """
-    for group in groups:
-        match = next((m for m in group.matches if m.compare(client)), None)
-        if match:
-            # A way to call go_to_group() because its impossible call directly
-            client.qtile.cmd_simulate_keypress([SUPER, "shift"], group.name)
+    route_on_new_title(client)
+
+
+@hook.subscribe.client_killed
+@timed_hook
+def forget_client(client):
+    """ Drop pending watches and cached state of closed clients """
+    CLIENT_WATCHER.forget(client)
+    route_on_new_title.forget(client)
+    GROUP_MATCHES.forget(client)
 
 
 ###############################################################################
@@ -727,8 +884,8 @@ dgroups_app_rules = []  # type: list
 follow_mouse_focus = True
 bring_front_click = False
 cursor_warp = False
-floating_layout = layout.Floating(
-    float_rules=[
+FLOAT_RULES = RuleIndex(
+    (m, True) for m in [
         # Run the utility of `xprop` to see the wm class and name of an X
         # client.
         *layout.Floating.default_float_rules,
@@ -741,7 +898,9 @@ floating_layout = layout.Floating(
         Match(title="iwgtk"),  # Wireless configuration
         Match(wm_class="thunar"),  # Wireless configuration
         Match(wm_class="calcurse"),  # Wireless configuration
-    ],
+    ])
+floating_layout = layout.Floating(
+    float_rules=[Match(func=FLOAT_RULES.matches)],
     **layout_theme
 )
 auto_fullscreen = True
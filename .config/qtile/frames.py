@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List
+
+from libqtile import bar as libbar
+
+from timeline import TRACER
+
+# One paint per bar per frame at most
+FRAME = 1 / 60
+
+
+class FrameScheduler:
+    """ Coalesces the draws of a bar and its widgets into one paint per frame
+
+    Widget and bar draw() calls only mark them dirty; once per frame each
+    dirty widget repaints its own region, or the whole bar is painted once
+    if it asked for a full redraw (e.g. a widget changed its width).
+    """
+
+    def __init__(self, bar, interval: float = FRAME) -> None:
+        self.bar = bar
+        self.interval = interval
+        self.dirty: Dict[int, object] = {}
+        self.full = False
+        self._handle = None
+        self._flushing = False
+
+        # Counters (see stats())
+        self.started = time.monotonic()
+        self.requests = 0
+        self.frames = 0
+        self.draws: Dict[str, int] = {}
+
+    def attach(self) -> None:
+        if getattr(self.bar, "_frame_draw", None) is None:
+            self.bar._frame_draw = self.bar.draw
+            self.bar.draw = self.mark_bar
+            actual_draw = self.bar._actual_draw
+
+            def paint_bar():
+                # The widgets drawn by the bar paint itself are not marked again
+                start = time.perf_counter()
+                self._flushing = True
+                try:
+                    actual_draw()
+                finally:
+                    self._flushing = False
+                    TRACER.complete("full", "paint", start)
+            self.bar._actual_draw = paint_bar
+        for widget in self.bar.widgets:
+            self._attach_widget(widget)
+            for child in getattr(widget, "widgets", []):  # e.g. closed WidgetBox
+                self._attach_widget(child)
+
+    def _attach_widget(self, widget) -> None:
+        if getattr(widget, "_frame_draw", None) is not None:
+            return
+        widget._frame_draw = widget.draw
+
+        def draw():
+            if self._flushing:
+                self._paint(widget)
+            else:
+                self.mark(widget)
+        widget.draw = draw
+
+    def _schedule(self) -> None:
+        self.requests += 1
+        if self._handle is None:
+            self._handle = self.bar.qtile.call_later(self.interval, self.flush)
+
+    def mark(self, widget) -> None:
+        self.dirty[id(widget)] = widget
+        self._schedule()
+
+    def mark_bar(self) -> None:
+        self.full = True
+        self._schedule()
+
+    def _paint(self, widget) -> None:
+        self.draws[widget.name] = self.draws.get(widget.name, 0) + 1
+        widget._frame_draw()
+
+    def flush(self) -> None:
+        self._handle = None
+        self.frames += 1
+        dirty, self.dirty = self.dirty, {}
+        full, self.full = self.full, False
+        if full:
+            # Bar.draw() keeps its guards (no widgets...) and queues the paint
+            self.bar._frame_draw()
+            return
+        self._flushing = True
+        start = time.perf_counter()
+        try:
+            for widget in dirty.values():
+                if widget in self.bar.widgets:
+                    self._paint(widget)
+        finally:
+            self._flushing = False
+            TRACER.complete("widgets", "paint", start,
+                            widgets=[getattr(w, "name", "?") for w in dirty.values()])
+
+    def stats(self) -> Dict[str, object]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "frames": self.frames,
+            "requests": self.requests,
+            "frames_per_second": round(self.frames / elapsed, 2),
+            "draws_per_second": {name: round(count / elapsed, 2)
+                                 for name, count in sorted(self.draws.items())},
+        }
+
+
+SCHEDULERS: Dict[int, FrameScheduler] = {}
+
+
+def bars(qtile) -> List[libbar.Bar]:
+    return [gap for screen in qtile.screens
+            for gap in (screen.top, screen.bottom, screen.left, screen.right)
+            if isinstance(gap, libbar.Bar)]
+
+
+def attach_all(qtile) -> None:
+    """ Put every configured bar under a frame scheduler (idempotent) """
+    current = {}
+    for bar in bars(qtile):
+        scheduler = SCHEDULERS.get(id(bar))
+        if scheduler is None or scheduler.bar is not bar:
+            scheduler = FrameScheduler(bar)
+        scheduler.attach()
+        current[id(bar)] = scheduler
+    SCHEDULERS.clear()
+    SCHEDULERS.update(current)
+
+
+def detach(bar) -> None:
+    """ Drop the scheduler of a bar being finalized, with its pending frame """
+    scheduler = SCHEDULERS.pop(id(bar), None)
+    if scheduler is not None and scheduler._handle is not None:
+        scheduler._handle.cancel()
+        scheduler._handle = None
+
+
+def stats() -> Dict[str, object]:
+    return {f"bar{i}": s.stats() for i, s in enumerate(SCHEDULERS.values())}
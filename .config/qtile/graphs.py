@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+from array import array
+
+import cairocffi
+from libqtile import utils
+
+
+class RingGraph:
+    """ Mixin for qtile line graphs: ring buffer of samples, scroll-and-append drawing
+
+    Samples live in a preallocated array used as a ring. The line is kept on
+    an offscreen surface: each new sample scrolls it left and strokes only the
+    newest segment, instead of re-stroking the whole history every frame.
+    The whole line is stroked again only when the scale changes, or when the
+    widget or bar is resized (the surfaces are then re-created).
+    Graph types other than "line" keep qtile's own drawing.
+    """
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        self.ring = array("d", [0.0]) * self.samples
+        self.head = 0  # index of the oldest sample
+        self.pushed = 0
+        self.frames = 0
+        self.full_draws = 0
+        self._surfaces = None
+        self._size = None
+        self._scale = None
+
+    def _resized(self) -> bool:
+        return self._size != (self.width, self.bar.height)
+
+    def _setup_surfaces(self) -> None:
+        self._size = (self.width, self.bar.height)
+        inset = self.margin_x + self.border_width
+        self._origin = (inset, self.margin_y + self.border_width)
+        self._width = max(1, self.width - 2 * inset)
+        self._height = max(1, self.bar.height - 2 * (self.margin_y + self.border_width))
+        self._step = self._width / float(self.samples - 1)
+        self._surfaces = []
+        for _ in range(2):
+            surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, self._width, self._height)
+            ctx = cairocffi.Context(surface)
+            ctx.set_line_width(self.line_width)
+            ctx.set_line_cap(cairocffi.LINE_CAP_ROUND)
+            ctx.set_line_join(cairocffi.LINE_JOIN_ROUND)
+            self._surfaces.append((surface, ctx))
+
+    def _y(self, value: float) -> float:
+        scaled = self._height * value / (self.maxvalue or 1)
+        return scaled if self.start_pos == "top" else self._height - scaled
+
+    def _stroke_all(self) -> None:
+        self.full_draws += 1
+        surface, ctx = self._surfaces[0]
+        ctx.set_operator(cairocffi.OPERATOR_CLEAR)
+        ctx.paint()
+        ctx.set_operator(cairocffi.OPERATOR_OVER)
+        ctx.set_source_rgba(*utils.rgb(self.graph_color))
+        for i in range(self.samples):
+            ctx.line_to(i * self._step, self._y(self.ring[(self.head + i) % self.samples]))
+        ctx.stroke()
+
+    def _stroke_newest(self, previous: float, value: float) -> None:
+        # Shift by whole pixels, keeping the total scroll exact over time
+        shift = round(self.pushed * self._step) - round((self.pushed - 1) * self._step)
+        src, _ = self._surfaces[0]
+        dst, ctx = self._surfaces[1]
+        ctx.set_operator(cairocffi.OPERATOR_SOURCE)
+        ctx.set_source_surface(src, -shift, 0)
+        ctx.paint()
+        ctx.set_operator(cairocffi.OPERATOR_OVER)
+        ctx.set_source_rgba(*utils.rgb(self.graph_color))
+        ctx.move_to(self._width - shift, self._y(previous))
+        ctx.line_to(self._width, self._y(value))
+        ctx.stroke()
+        self._surfaces.reverse()
+
+    def restyle(self) -> None:
+        """ Stroke the cached line again, e.g. in a new graph_color """
+        if self._surfaces is not None:
+            self._stroke_all()
+
+    def push(self, value):
+        if self.type != "line":
+            return super().push(value)
+
+        previous = self.ring[(self.head - 1) % self.samples]
+        self.ring[self.head] = value
+        self.head = (self.head + 1) % self.samples
+        self.pushed += 1
+
+        if self._resized():
+            self._setup_surfaces()
+            self._scale = None
+        if self._scale != self.maxvalue:
+            self._scale = self.maxvalue
+            self._stroke_all()
+        else:
+            self._stroke_newest(previous, value)
+        self.draw()
+
+    def draw(self):
+        if self.type != "line":
+            return super().draw()
+        if self._surfaces is not None and self._resized():
+            self._setup_surfaces()
+            self._scale = self.maxvalue
+            self._stroke_all()
+        self.frames += 1
+        self.drawer.clear(self.background or self.bar.background)
+        if self.border_width:
+            self.drawer.set_source_rgb(self.border_color)
+            self.drawer.ctx.set_line_width(self.border_width)
+            self.drawer.ctx.rectangle(
+                self.margin_x, self.margin_y,
+                self.width - self.margin_x * 2 - self.border_width,
+                self.bar.height - self.margin_y * 2 - self.border_width)
+            self.drawer.ctx.stroke()
+        if self._surfaces is not None:
+            self.drawer.ctx.set_source_surface(self._surfaces[0][0], *self._origin)
+            self.drawer.ctx.paint()
+        self.drawer.draw(offsetx=self.offset, offsety=self.offsety, width=self.width)
+
+
+if __name__ == "__main__":
+    # Updates per second and memory allocated per update of a line graph:
+    # re-stroked from a list every frame as qtile's _Graph does, against
+    # RingGraph; plus a resize: python graphs.py
+    import random
+    import time
+    import tracemalloc
+    import types
+
+    class Drawer:
+        def __init__(self, width: int, height: int) -> None:
+            self.surface = cairocffi.ImageSurface(cairocffi.FORMAT_ARGB32, width, height)
+            self.ctx = cairocffi.Context(self.surface)
+
+        def clear(self, colour) -> None:
+            self.set_source_rgb(colour)
+            self.ctx.paint()
+
+        def set_source_rgb(self, colour) -> None:
+            self.ctx.set_source_rgba(*utils.rgb(colour))
+
+        def draw(self, **kwargs) -> None:
+            pass
+
+    class Graph:
+        """ The line drawing of qtile 0.22's _Graph """
+
+        samples, width, margin_x, margin_y, border_width, line_width = 100, 100, 3, 3, 0, 1
+        type, start_pos, maxvalue, offset, offsety = "line", "bottom", 100, 0, 0
+        background, graph_color, border_color = "000000", "18BAEB", "215578"
+
+        def __init__(self) -> None:
+            self.bar = types.SimpleNamespace(height=23, background="000000")
+            self.drawer = Drawer(self.width, self.bar.height)
+            self.values = [0] * self.samples
+
+        def _configure(self, qtile, bar) -> None:
+            pass
+
+        def push(self, value) -> None:
+            self.values.insert(0, value)
+            self.values.pop()
+            self.draw()
+
+        def draw(self) -> None:
+            self.drawer.clear(self.background)
+            ctx = self.drawer.ctx
+            ctx.set_source_rgba(*utils.rgb(self.graph_color))
+            ctx.set_line_width(self.line_width)
+            step = (self.width - 2 * self.margin_x) / (self.samples - 1)
+            height = self.bar.height - 2 * self.margin_y
+            for i, value in enumerate(reversed(self.values)):
+                ctx.line_to(self.margin_x + i * step,
+                            self.margin_y + height * (1 - value / self.maxvalue))
+            ctx.stroke()
+            self.drawer.draw()
+
+    class Ring(RingGraph, Graph):
+        pass
+
+    updates = 5000
+    random.seed(0)
+    values = [random.uniform(0, 100) for _ in range(updates)]
+
+    def allocated(push) -> float:
+        """ Mean peak of memory allocated during push() (B) """
+        tracemalloc.start()
+        total = 0
+        for value in values:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            push(value)
+            total += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        return total / updates
+
+    overhead = allocated(lambda value: None)
+    for graph in (Graph(), Ring()):
+        graph._configure(None, graph.bar)
+        graph.push(0)
+        start = time.perf_counter()
+        for value in values:
+            graph.push(value)
+        elapsed = time.perf_counter() - start
+        print(f"{type(graph).__name__}: {updates / elapsed:.0f} updates/s, "
+              f"{allocated(graph.push) - overhead:.0f} B allocated per update")
+
+    # A wider widget: new surfaces, one full stroke, then scrolling again
+    graph.width += 50
+    graph.draw()
+    assert graph._surfaces[0][0].get_width() == graph.width - 2 * graph.margin_x
+    full_draws = graph.full_draws
+    graph.push(50)
+    assert graph.full_draws == full_draws
+    print("resize: surfaces re-created, line stroked once")
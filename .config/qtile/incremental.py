@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+import time
+import types
+from typing import Any, Dict, List
+
+from libqtile import bar as libbar
+from libqtile import hook
+from libqtile.config import Group, KeyChord
+from libqtile.log_utils import logger
+from libqtile.widget.base import _Widget
+
+import frames
+from notify import NOTIFIER
+
+def _record_arguments(cls) -> None:
+    """ Keep in widget._arguments what each widget is built with
+
+    _user_config only holds keyword options: without the positional
+    arguments Spacer(10) and Spacer(20), or two TextBox texts, compare equal.
+    """
+    if "__new__" in vars(cls):
+        return  # done by a previous import (reload_config() imports this again)
+
+    def __new__(klass, *args, **kwargs):
+        widget = object.__new__(klass)
+        widget._arguments = (args, kwargs)
+        return widget
+    cls.__new__ = __new__
+
+
+# config.py imports this module before it builds any widget
+_record_arguments(_Widget)
+
+# Nesting followed when comparing objects (Key -> LazyCall -> function -> Command...,
+# Match -> RuleIndex -> Match -> regex)
+MAX_DEPTH = 16
+
+
+def fingerprint(obj: Any, depth: int = MAX_DEPTH) -> Any:
+    """ A comparable summary of a config value, equal across two loads of the file
+
+    Functions compare by code and closure, widgets by class and the arguments
+    they were built with (not their state), qtile objects by their attributes. Objects of this
+    config (a launcher's Command, a RuleIndex, a Backlight) compare by what
+    their config_fingerprint() returns; others by type only, as they are
+    kept from the running config.
+    """
+    if depth <= 0:
+        return type(obj).__qualname__
+    depth -= 1
+    if obj is None or isinstance(obj, (str, int, float, bool, bytes)):
+        return obj
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        items = [fingerprint(o, depth) for o in obj]
+        return (type(obj).__name__, tuple(sorted(items, key=repr) if isinstance(obj, (set, frozenset)) else items))
+    if isinstance(obj, dict):
+        return tuple(sorted((repr(k), fingerprint(v, depth)) for k, v in obj.items()))
+    if isinstance(obj, types.CodeType):
+        return (obj.co_code, fingerprint(obj.co_consts, depth), obj.co_names)
+    if isinstance(obj, types.FunctionType):
+        cells = tuple(fingerprint(c.cell_contents, depth) for c in obj.__closure__ or ())
+        return (obj.__qualname__, fingerprint(obj.__code__, depth), cells)
+    if isinstance(obj, types.MethodType):
+        return (fingerprint(obj.__func__, depth), fingerprint(obj.__self__, depth))
+    if callable(getattr(type(obj), "config_fingerprint", None)):
+        return (type(obj).__qualname__, fingerprint(obj.config_fingerprint(), depth))
+    if isinstance(obj, _Widget):
+        return (type(obj).__qualname__, fingerprint(getattr(obj, "_arguments", None), depth))
+    if isinstance(obj, types.ModuleType):
+        return obj.__name__
+    if type(obj).__module__.startswith("libqtile") and hasattr(obj, "__dict__"):
+        return (type(obj).__qualname__, fingerprint(vars(obj), depth))
+    if hasattr(obj, "pattern"):  # compiled regex
+        return ("re", obj.pattern)
+    return type(obj).__qualname__
+
+
+def load(path: str) -> types.ModuleType:
+    """ Execute the config file as a separate module, without keeping its hooks
+
+    This runs before anything is known to be applicable, against the running
+    helper modules. At module level config.py may build new objects freely
+    (BACKLIGHT, BARS... are kept from the running config when they compare
+    equal), but may only touch the shared singletons in ways that are
+    harmless if the result is thrown away or fully reloaded:
+    AFFINITY.configure() (a full reload configures it again),
+    COMMANDS.register() (one Command per command line) and time_keys() on
+    its own keys. With QTILE_PROFILE set, the profile report is rewritten.
+    """
+    spec = importlib.util.spec_from_file_location("config_next", path)
+    module = importlib.util.module_from_spec(spec)
+    saved = {name: list(funcs) for name, funcs in hook.subscriptions.items()}
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        hook.subscriptions.clear()
+        hook.subscriptions.update(saved)
+    return module
+
+
+def _functions(module: types.ModuleType) -> Dict[str, Any]:
+    return {name: fingerprint(value) for name, value in vars(module).items()
+            if isinstance(value, types.FunctionType) and value.__module__ == module.__name__}
+
+
+def _key_id(key) -> tuple:
+    return (frozenset(key.modifiers), key.key)
+
+
+def _group_fingerprint(group: Group) -> Any:
+    return fingerprint({k: v for k, v in vars(group).items() if k != "label"})
+
+
+def _bar_widgets(bar) -> List:
+    """ Every widget of a bar once, boxed ones included (open or not) """
+    widgets = {}
+    for widget in bar.widgets:
+        widgets[id(widget)] = widget
+        for child in getattr(widget, "widgets", []):
+            widgets[id(child)] = child
+    return list(widgets.values())
+
+
+def _configured_widgets(bar) -> List:
+    """ The widgets a bar was given: not the children an open WidgetBox inserts """
+    boxed = {id(child) for widget in bar.widgets for child in getattr(widget, "widgets", [])}
+    return [widget for widget in bar.widgets if id(widget) not in boxed]
+
+
+class FullReload(Exception):
+    """ The new config changed something that can't be applied in place """
+
+
+class Reload:
+    def __init__(self, qtile, live: types.ModuleType, new: types.ModuleType) -> None:
+        self.qtile = qtile
+        self.live = live
+        self.new = new
+        self.applied: List[str] = []
+        self.adopted: set = set()
+
+    def check(self) -> None:
+        if _functions(self.live) != _functions(self.new):
+            raise FullReload("functions or hooks changed")
+        for name in ("layouts", "mouse", "floating_layout", "widget_defaults"):
+            if fingerprint(getattr(self.live, name, None)) != fingerprint(getattr(self.new, name, None)):
+                raise FullReload(f"{name} changed")
+        if len(self.new.screens) != len(self.qtile.screens):
+            raise FullReload("number of screens changed")
+        old_groups = {g.name: g for g in self.live.groups}
+        for group in self.new.groups:
+            old = old_groups.get(group.name)
+            if old is not None and _group_fingerprint(old) != _group_fingerprint(group):
+                raise FullReload(f"group {group.name} changed")
+            if old is None and (group.matches or group.spawn):
+                # add_group() takes neither: qtile only wires them when loading a config
+                raise FullReload(f"new group {group.name} has matches or spawn")
+
+    def keys(self) -> None:
+        old = {_key_id(k): k for k in self.live.keys}
+        new = {_key_id(k): k for k in self.new.keys}
+        for key_id, key in old.items():
+            if key_id not in new or fingerprint(new[key_id]) != fingerprint(key):
+                self.qtile.ungrab_key(key)
+        for key_id, key in new.items():
+            if key_id not in old or fingerprint(old[key_id]) != fingerprint(key):
+                self.qtile.grab_key(key)
+                kind = "chord" if isinstance(key, KeyChord) else "key"
+                self.applied.append(f"{kind} {'+'.join([*key.modifiers, key.key])}")
+        for key_id in old.keys() - new.keys():
+            self.applied.append(f"unbound {'+'.join([*old[key_id].modifiers, old[key_id].key])}")
+        self.qtile.config.keys = self.new.keys
+
+    def groups(self) -> None:
+        old = {g.name: g for g in self.live.groups}
+        new = {g.name: g for g in self.new.groups}
+        for name in old.keys() - new.keys():
+            self.qtile.delete_group(name)
+            self.applied.append(f"deleted group {name}")
+        for name, group in new.items():
+            if name not in old:
+                self.qtile.add_group(name, layout=group.layout, label=group.label)
+                self.applied.append(f"added group {name}")
+            elif old[name].label != group.label:
+                self.qtile.groups_map[name].label = group.label
+                self.applied.append(f"relabeled group {name}")
+        self.qtile.config.groups = self.new.groups
+
+    def bars(self) -> None:
+        for index, (screen, new_screen) in enumerate(zip(self.qtile.screens, self.new.screens)):
+            for position in ("top", "bottom", "left", "right"):
+                old_bar = getattr(screen, position)
+                new_bar = getattr(new_screen, position)
+                if fingerprint(_configured_widgets(old_bar) if old_bar else None) == \
+                        fingerprint(_configured_widgets(new_bar) if new_bar else None):
+                    continue
+                if not isinstance(old_bar, libbar.Bar) or not isinstance(new_bar, libbar.Bar):
+                    raise FullReload(f"bar added or removed on screen {index}")
+                if not all(hasattr(w, "_arguments") for w in _bar_widgets(old_bar)):
+                    raise FullReload(f"unknown widget arguments on screen {index}")
+                # Bar.finalize() leaves its widgets (and their timers) alone
+                for widget in _bar_widgets(old_bar):
+                    self.qtile.widgets_map.pop(widget.name, None)
+                    widget.finalize()
+                old_bar.finalize()
+                frames.detach(old_bar)
+                setattr(screen, position, new_bar)
+                new_bar._configure(self.qtile, screen)
+                self.adopted.add(id(new_bar))
+                self.adopted.update(id(w) for w in _bar_widgets(new_bar))
+                self.applied.append(f"rebuilt {position} bar of screen {index}")
+        if self.adopted:
+            for screen in self.qtile.screens:
+                screen.group.layout_all()
+            frames.attach_all(self.qtile)
+
+    def sync_globals(self) -> None:
+        """ Point the running module to the new values it now uses """
+        for name, value in vars(self.new).items():
+            if name.startswith("__") or not hasattr(self.live, name):
+                continue
+            if isinstance(value, (_Widget, libbar.Bar)) and id(value) not in self.adopted:
+                continue
+            if isinstance(value, (_Widget, libbar.Bar)) or \
+                    fingerprint(getattr(self.live, name)) != fingerprint(value):
+                setattr(self.live, name, value)
+
+
+def reload_changes(qtile) -> None:
+    """ Apply only what changed in config.py; falls back to a full reload """
+    start = time.perf_counter()
+    # qtile imports the config file under its own name (config.py -> "config")
+    name = os.path.splitext(os.path.basename(qtile.config.file_path))[0]
+    live = sys.modules[name]
+    try:
+        new = load(qtile.config.file_path)
+        reload = Reload(qtile, live, new)
+        reload.check()
+    except FullReload as reason:
+        logger.info("Incremental reload not possible (%s), reloading everything", reason)
+        NOTIFIER.send("Reload", f"Full reload: {reason}", tag="reload")
+        qtile.reload_config()
+        return
+    except Exception:
+        # Nothing applied yet: keep running the current config
+        logger.exception("Incremental reload failed")
+        NOTIFIER.send("Reload", "Incremental reload failed, see the log", tag="reload")
+        return
+
+    try:
+        reload.keys()
+        reload.groups()
+        reload.bars()
+        reload.sync_globals()
+    except Exception as e:
+        # Part of the changes may be applied: start over from the whole file
+        if isinstance(e, FullReload):
+            logger.info("Incremental reload not possible (%s), reloading everything", e)
+        else:
+            logger.exception("Incremental reload failed partway, reloading everything")
+        NOTIFIER.send("Reload", f"Full reload: {e}", tag="reload")
+        qtile.reload_config()
+        return
+
+    ms = (time.perf_counter() - start) * 1000
+    summary = ", ".join(reload.applied) or "nothing changed"
+    logger.info("Incremental reload in %.1f ms: %s", ms, summary)
+    NOTIFIER.send("Reload", f"{ms:.0f} ms: {summary}", tag="reload")
+
+
+if __name__ == "__main__":
+    # Rebuild a bar over and over against a fake qtile: python incremental.py
+    from sampler import SAMPLER
+
+    class Handle:
+        def cancel(self):
+            pass
+
+    class Qtile:
+        def __init__(self):
+            self.widgets_map = {}
+
+        def call_later(self, delay, func):
+            return Handle()
+
+    class Probe(_Widget):
+        """ Subscribes to SAMPLER like the sampled widgets """
+
+        def __init__(self, length, name):
+            _Widget.__init__(self, length)
+            self.name = name
+
+        def _configure(self, qtile, bar):
+            self.qtile, self.bar = qtile, bar
+            SAMPLER.subscribe(qtile, self.on_sample)
+
+        def on_sample(self, sampler):
+            self.draw()
+
+        def draw(self):
+            pass
+
+        def finalize(self):
+            SAMPLER.unsubscribe(self.on_sample)
+
+    class Bar(libbar.Bar):
+        def __init__(self, widgets):
+            self.widgets = widgets
+
+        def _configure(self, qtile, screen):
+            self.qtile = qtile
+            for widget in self.widgets:
+                qtile.widgets_map[widget.name] = widget
+                widget._configure(qtile, self)
+
+        def draw(self):
+            pass
+
+        def _actual_draw(self):
+            pass
+
+        def finalize(self):
+            pass
+
+    class Screen:
+        def __init__(self, top):
+            self.top, self.bottom, self.left, self.right = top, None, None, None
+            self.group = types.SimpleNamespace(layout_all=lambda: None)
+
+    def config(length: int) -> types.SimpleNamespace:
+        return types.SimpleNamespace(screens=[Screen(Bar([Probe(length, "spacer"),
+                                                          Probe(5, "clock")]))])
+
+    qtile = Qtile()
+    qtile.screens = config(0).screens
+    qtile.screens[0].top._configure(qtile, qtile.screens[0])
+    counts = set()
+    for length in range(1, 51):
+        reload = Reload(qtile, None, config(length))
+        reload.bars()
+        assert reload.applied, "Spacer(n) -> Spacer(n + 1) not applied"
+        counts.add((len(qtile.widgets_map), len(SAMPLER.subscribers), len(frames.SCHEDULERS)))
+    unchanged = Reload(qtile, None, config(50))
+    unchanged.bars()
+    assert not unchanged.applied, "identical bar rebuilt"
+    assert counts == {(2, 2, 1)}, counts
+    print(f"50 bar rebuilds: widgets, subscribers, schedulers stay at {counts.pop()}")
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from libqtile.config import KeyChord
+from libqtile.lazy import lazy
+from libqtile.log_utils import logger
+
+from commands import Histogram
+from notify import NOTIFIER
+from timeline import TRACER
+
+REPORT_DIR = os.path.expanduser("~/.cache/qtile")
+# Samples kept per name (older ones are dropped)
+SAMPLES = 256
+# Calls slower than this are logged: one frame at 60 Hz
+SLOW_MS = 1000 / 60
+
+
+def percentile(values: List[float], p: float) -> float:
+    """ Nearest-rank percentile of sorted values """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+class Timings:
+    """ Last durations of named calls, in one fixed-size ring buffer per name """
+
+    def __init__(self, kind: str, path: str, samples: int = SAMPLES,
+                 slow_ms: float = SLOW_MS) -> None:
+        self.kind = kind
+        self.path = path
+        self.samples = samples
+        self.slow_ms = slow_ms
+        self.buffers: Dict[str, Deque[float]] = {}
+        self.calls: Dict[str, int] = {}
+        self.slow: Dict[str, int] = {}
+        self._started: Dict[str, float] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.buffers[name] = deque(maxlen=self.samples)
+            self.calls[name] = self.slow[name] = 0
+        buffer.append(ms)
+        self.calls[name] += 1
+        if ms > self.slow_ms:
+            self.slow[name] += 1
+            logger.warning("Slow %s %s: %.1f ms", self.kind, name, ms)
+
+    def start(self, qtile, name: str) -> None:
+        """ With stop(), for lazy.function: time the commands in between """
+        self._started[name] = time.perf_counter()
+
+    def stop(self, qtile, name: str) -> None:
+        started = self._started.pop(name, None)
+        if started is not None:
+            end = time.perf_counter()
+            self.add(name, (end - started) * 1000)
+            TRACER.complete(name, self.kind, started, end)
+
+    def stats(self) -> Dict[str, dict]:
+        stats = {}
+        for name, buffer in self.buffers.items():
+            values = sorted(buffer)
+            histogram = Histogram()
+            for ms in values:
+                histogram.add(ms)
+            stats[name] = {
+                "calls": self.calls[name],
+                "slow": self.slow[name],
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "max_ms": round(values[-1], 3),
+                "histogram": histogram.to_dict()["buckets"],
+            }
+        return stats
+
+    def worst(self, count: int = 5) -> List[Tuple[str, dict]]:
+        """ Names with the highest p95 """
+        return sorted(self.stats().items(), key=lambda s: -s[1]["p95_ms"])[:count]
+
+    def dump(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump({"slow_ms": self.slow_ms, "samples": self.samples,
+                           "stats": self.stats()}, f, indent=2)
+        except OSError:
+            logger.exception("Could not write %s", self.path)
+
+    def show(self, qtile=None) -> None:
+        """ Dump the stats and pop up the worst offenders (for lazy.function) """
+        self.dump()
+        lines = [f"{name}: p95 {s['p95_ms']:.1f} ms, max {s['max_ms']:.1f} ms ({s['slow']} slow)"
+                 for name, s in self.worst()]
+        NOTIFIER.send(f"Slowest {self.kind}s", "\n".join(lines) or "No samples yet",
+                      expire=8000, tag=f"timings-{self.kind}")
+
+
+# reload_config() re-imports this module: keep the running instances, so
+# samples accumulate across reloads
+HOOKS = globals().get("HOOKS") or Timings("hook", os.path.join(REPORT_DIR, "hook-latency.json"))
+KEYS = globals().get("KEYS") or Timings("keybinding", os.path.join(REPORT_DIR, "key-latency.json"))
+
+
+def timed_hook(func):
+    """ Record the duration of each call of a hook function in HOOKS (and TRACER)
+
+    Goes below @hook.subscribe.*; coroutine hooks are timed until they finish.
+    """
+    name = func.__name__
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                HOOKS.add(name, (end - start) * 1000)
+                TRACER.complete(name, "hook", start, end)
+        return wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            HOOKS.add(name, (end - start) * 1000)
+            TRACER.complete(name, "hook", start, end)
+    return wrapper
+
+
+def _key_name(key) -> str:
+    combo = "+".join([*key.modifiers, key.key])
+    return f"{key.desc} ({combo})" if key.desc else combo
+
+
+def time_keys(keys: list, prefix: str = "") -> None:
+    """ Record in KEYS how long the commands of each binding take, chords included
+
+    The commands of every Key are put between KEYS.start and KEYS.stop; keys
+    of a chord are named after its mode ("Settings > Audio > j").
+    """
+    for key in keys:
+        if isinstance(key, KeyChord):
+            mode = key.mode if isinstance(key.mode, str) else ""
+            label = getattr(key, "name", "") or mode or key.key
+            time_keys(key.submappings, f"{prefix}{label} > ")
+            continue
+        name = prefix + _key_name(key)
+        key.commands = (lazy.function(KEYS.start, name), *key.commands,
+                        lazy.function(KEYS.stop, name))
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+from typing import Callable, Optional
+
+from libqtile.log_utils import logger
+
+Provider = Callable[[], int]
+
+
+def randr_provider() -> int:
+    """ Count connected outputs asking RandR directly (no xrandr/shell fork) """
+    import xcffib
+    import xcffib.randr
+
+    conn = xcffib.connect(display=os.environ.get("DISPLAY"))
+    try:
+        randr = conn(xcffib.randr.key)
+        root = conn.get_setup().roots[conn.pref_screen].root
+        resources = randr.GetScreenResourcesCurrent(root).reply()
+        cookies = [randr.GetOutputInfo(output, resources.config_timestamp)
+                   for output in resources.outputs]
+        return sum(1 for c in cookies
+                   if c.reply().connection == xcffib.randr.Connection.Connected)
+    finally:
+        conn.disconnect()
+
+
+class MonitorCache:
+    """ Number of connected monitors, queried once and kept between reloads """
+
+    def __init__(self, provider: Provider = randr_provider) -> None:
+        self.provider = provider
+        self.queries = 0
+        self._count: Optional[int] = None
+
+    def count(self) -> int:
+        if self._count is None:
+            self.refresh()
+        return self._count
+
+    def refresh(self) -> int:
+        """ Query the provider again (only needed when RandR reports a change) """
+        self.queries += 1
+        try:
+            self._count = max(1, self.provider())
+        except Exception:
+            logger.exception("Could not query RandR, assuming one monitor")
+            self._count = 1
+        return self._count
+
+    def update(self, count: int) -> None:
+        """ Store a count already known by qtile, without querying """
+        self._count = max(1, count)
+
+
+# reload_config() re-imports this module too: keep the cache of the
+# previous import so RandR is not queried again on every reload.
+CACHE = globals().get("CACHE") or MonitorCache()
+
+
+def get_monitors() -> int:
+    """ Get number of connected monitors """
+    return CACHE.count()
+
+
+if __name__ == "__main__":
+    # Config reloads against a fake RandR provider as slow as xrandr: python monitors.py
+    import importlib
+    import subprocess
+    import time
+
+    import monitors  # this file as a module, re-imported like reload_config() does
+
+    def slow_provider() -> int:
+        time.sleep(0.3)  # xrandr --query on a docked laptop
+        return 2
+
+    def no_subprocess(*args, **kwargs):
+        raise AssertionError("a reload started a subprocess")
+
+    subprocess.Popen = no_subprocess
+    monitors.CACHE = MonitorCache(slow_provider)
+    start = time.perf_counter()
+    assert monitors.get_monitors() == 2
+    print(f"startup: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    worst = 0.0
+    for _ in range(20):
+        start = time.perf_counter()
+        importlib.reload(monitors)
+        assert monitors.get_monitors() == 2
+        worst = max(worst, time.perf_counter() - start)
+    assert monitors.CACHE.queries == 1, monitors.CACHE.queries
+    assert worst < 0.005, f"a reload took {worst * 1000:.1f} ms"
+    print(f"20 reloads: at most {worst * 1000:.2f} ms each, 1 provider query in total")
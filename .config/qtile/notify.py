@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import subprocess
+from typing import Dict, Optional, Set
+
+from dbus_next import Message
+from dbus_next.aio import MessageBus
+from dbus_next.constants import MessageType
+from libqtile.log_utils import logger
+
+NOTIFICATIONS = "org.freedesktop.Notifications"
+NOTIFICATIONS_PATH = "/org/freedesktop/Notifications"
+
+
+class Notifier:
+    """ Desktop notifications over one session bus connection kept open
+
+    Notifications sent with the same tag replace each other (Notify's
+    replaces_id) instead of stacking. bus_address defaults to the session
+    bus (DBUS_SESSION_BUS_ADDRESS), so a private dbus-daemon can be used.
+    """
+
+    def __init__(self, app_name: str = "qtile", bus_address: Optional[str] = None) -> None:
+        self.app_name = app_name
+        self.bus_address = bus_address
+        self.bus: Optional[MessageBus] = None
+        self.ids: Dict[str, int] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _connect(self) -> MessageBus:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.bus is None or not self.bus.connected:
+                self.bus = await MessageBus(bus_address=self.bus_address).connect()
+        return self.bus
+
+    async def notify(self, title: str, body: str = "", expire: int = 2000,
+                     tag: Optional[str] = None) -> int:
+        """ Send a notification, returning its id (0 on error) """
+        bus = await self._connect()
+        reply = await bus.call(Message(
+            destination=NOTIFICATIONS,
+            path=NOTIFICATIONS_PATH,
+            interface=NOTIFICATIONS,
+            member="Notify",
+            signature="susssasa{sv}i",
+            body=[self.app_name, self.ids.get(tag, 0), "", title, body, [], {}, expire]))
+        if reply.message_type == MessageType.ERROR:
+            logger.warning("Notification failed: %s", reply.body)
+            return 0
+        notification_id = reply.body[0]
+        if tag is not None:
+            self.ids[tag] = notification_id
+        return notification_id
+
+    def send(self, title: str, body: str = "", expire: int = 2000,
+             tag: Optional[str] = None) -> None:
+        """ Fire and forget, usable from sync code (hooks, lazy functions) """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop yet (qtile is still loading the config)
+            subprocess.Popen(["notify-send", title, body, f"--expire-time={expire}"])
+            return
+        task = loop.create_task(self.notify(title, body, expire, tag))
+        self._tasks.add(task)
+        task.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.warning("Could not send a notification", exc_info=task.exception())
+        # The next send() connects again
+        if self.bus is not None:
+            self.bus.disconnect()
+        self.bus = None
+
+
+# reload_config() re-imports this module: keep the running instance and its
+# bus connection instead of opening another one per reload
+NOTIFIER = globals().get("NOTIFIER") or Notifier()
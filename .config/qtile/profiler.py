@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from libqtile.log_utils import logger
+
+from notify import NOTIFIER
+
+# Profiling is off unless QTILE_PROFILE is set, e.g.: QTILE_PROFILE=1 qtile start
+ENABLED = bool(os.environ.get("QTILE_PROFILE"))
+REPORT_PATH = os.path.expanduser(
+    os.environ.get("QTILE_PROFILE_REPORT", "~/.cache/qtile/profile.json"))
+
+
+class Section:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = time.perf_counter()
+        self.mem_start = tracemalloc.get_traced_memory()[0]
+        self.children: List[Dict[str, Any]] = []
+
+    def close(self) -> Dict[str, Any]:
+        current = tracemalloc.get_traced_memory()[0]
+        return {
+            "name": self.name,
+            "ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "alloc_kb": round((current - self.mem_start) / 1024, 1),
+            "children": self.children,
+        }
+
+
+class Profiler:
+    """ Records wall time and allocations of each config section """
+
+    def __init__(self) -> None:
+        self.sections: List[Dict[str, Any]] = []
+        self.current: Optional[Section] = None
+        self.started = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def mark(self, name: str) -> None:
+        """ Close the running section and open a new one """
+        if self.current is not None:
+            self.sections.append(self.current.close())
+        self.current = Section(name)
+
+    def measure(self, name: str, func, *args, **kwargs):
+        """ Call func recording it as a child of the running section """
+        child = Section(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            result = child.close()
+            if self.current is not None:
+                self.current.children.append(result)
+
+    def report(self) -> Dict[str, Any]:
+        if self.current is not None:
+            self.sections.append(self.current.close())
+            self.current = None
+        tracemalloc.stop()
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "sections": self.sections,
+        }
+
+
+class _TimedWidgets:
+    """ Proxy of libqtile.widget that times each widget constructor """
+
+    def __init__(self, module) -> None:
+        self._module = module
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._module, name)
+        if not isinstance(attr, type):
+            return attr
+
+        def build(*args, **kwargs):
+            if PROFILER is None:  # built after finish(), e.g. for a new monitor
+                return attr(*args, **kwargs)
+            return PROFILER.measure(f"widget.{name}", attr, *args, **kwargs)
+        return build
+
+
+PROFILER: Optional[Profiler] = None
+
+
+def begin() -> None:
+    """ Start profiling this config load (no-op when profiling is disabled) """
+    global PROFILER
+    if ENABLED:
+        PROFILER = Profiler()
+
+
+def mark(name: str) -> None:
+    """ Start a new section of the config (no-op when profiling is disabled) """
+    if PROFILER is not None:
+        PROFILER.mark(name)
+
+
+def timed_widgets(module):
+    """ Return the widget module, wrapped only when profiling is enabled """
+    if PROFILER is None:
+        return module
+    return _TimedWidgets(module)
+
+
+def finish() -> None:
+    """ Write the JSON report and send a short notification """
+    global PROFILER
+    if PROFILER is None:
+        return
+
+    report = PROFILER.report()
+    PROFILER = None
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    slowest = max(report["sections"], key=lambda s: s["ms"])
+    summary = f"{report['total_ms']:.0f} ms, slowest: {slowest['name']} ({slowest['ms']:.0f} ms)"
+    logger.warning("Config profile: %s (%s)", summary, REPORT_PATH)
+    NOTIFIER.send("Qtile profile", summary, tag="profile")
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import time
+from typing import Dict
+
+from libqtile.log_utils import logger
+
+
+class Affinity:
+    """ Screen each group is shown on, for the current number of screens
+
+    Built from {screen index: group names}; groups not listed, or listed
+    for a screen that is not connected, go to the first screen. The table
+    is recomputed only when the number of screens changes.
+    """
+
+    def __init__(self, preferred: Dict[int, str] = None) -> None:
+        self.preferred: Dict[int, str] = dict(preferred or {})
+        self.count = 0
+        self.table: Dict[str, int] = {}
+
+    def configure(self, preferred: Dict[int, str]) -> None:
+        self.preferred = dict(preferred)
+        self.count = 0
+
+    def _build(self, count: int) -> None:
+        self.table = {name: index if index < count else 0
+                      for index, names in self.preferred.items() for name in names}
+        self.count = count
+
+    def screen(self, name: str, count: int) -> int:
+        if count != self.count:
+            self._build(count)
+        return self.table.get(name, 0)
+
+
+# Set from config.py. reload_config() re-imports this module: keep the
+# running instance, configure() then replaces its table
+AFFINITY = globals().get("AFFINITY") or Affinity()
+
+
+def show_group(qtile, name: str) -> None:
+    """ Show group on its predefined screen and focus that screen """
+    group = qtile.groups_map[name]
+    index = AFFINITY.screen(name, len(qtile.screens))
+    if qtile.current_screen.index != index:
+        qtile.focus_screen(index)
+    if qtile.current_screen.group is not group:
+        group.cmd_toscreen()
+
+
+def go_to_group(name: str):
+    """ Go to group but keeping it predefined screen (for lazy.function) """
+    def _inner(qtile):
+        show_group(qtile, name)
+    return _inner
+
+
+def route_window(client, name: str) -> None:
+    """ Move a client to a group and follow it, without simulating keypresses """
+    start = time.perf_counter()
+    if client.group is None or client.group.name != name:
+        client.togroup(name)
+    show_group(client.qtile, name)
+    logger.debug("Routed %s to group %s in %.2f ms",
+                 client.name, name, (time.perf_counter() - start) * 1000)
+
+
+if __name__ == "__main__":
+    # Rapid group switching against a fake qtile: python routing.py
+    class Screen:
+        def __init__(self, qtile, index):
+            self.qtile, self.index, self.group = qtile, index, None
+
+    class Group:
+        def __init__(self, qtile, name):
+            self.qtile, self.name = qtile, name
+
+        def cmd_toscreen(self):
+            self.qtile.calls += 1
+            self.qtile.current_screen.group = self
+
+    class Qtile:
+        def __init__(self, screens):
+            self.calls = 0
+            self.screens = [Screen(self, i) for i in range(screens)]
+            self.current_screen = self.screens[0]
+            self.groups_map = {name: Group(self, name) for name in "123456789"}
+
+        def focus_screen(self, index):
+            self.calls += 1
+            self.current_screen = self.screens[index]
+
+    AFFINITY.configure({1: "789"})
+    for screens in (1, 2):
+        qtile = Qtile(screens)
+        switches = 100_000
+        start = time.perf_counter()
+        for i in range(switches):
+            show_group(qtile, "123456789"[(i // 3) % 9])  # each group 3 times in a row
+        us = (time.perf_counter() - start) / switches * 1e6
+        print(f"{screens} screen(s): {us:.2f} us/switch, "
+              f"{qtile.calls} focus/toscreen calls for {switches} switches")
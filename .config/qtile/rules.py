@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from libqtile.config import Match
+
+# Memoized (wm_class, title) pairs kept before the cache is dropped
+MEMO_SIZE = 4096
+
+_STATIC_PROPERTIES = {"wm_class", "title"}
+
+
+class RuleIndex:
+    """ Matches compiled into dict lookups on wm_class and title
+
+    Rules with a single plain string on wm_class or title become dict keys,
+    compared by equality. For titles that is what Match does; for wm_class
+    Match tests whether the class is contained in the rule string, so a
+    rule "Firefox" no longer matches a class "Fire". Regex rules that only
+    look at wm_class/title are evaluated once per (wm_class, title) pair and
+    memoized. Rules on other
+    properties (wm_type, role, func...) are still compared on every call.
+    When several rules match, the first one given wins.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[Match, Any]]) -> None:
+        self.by_class: Dict[str, Tuple[int, Any]] = {}
+        self.by_title: Dict[str, Tuple[int, Any]] = {}
+        self.cacheable: List[Tuple[int, Match, Any]] = []
+        self.dynamic: List[Tuple[int, Match, Any]] = []
+        self._memo: Dict[Hashable, Optional[Tuple[int, Any]]] = {}
+        self.rules = list(rules)
+
+        for order, (match, result) in enumerate(self.rules):
+            properties = match._rules
+            if len(properties) == 1:
+                (name, value), = properties.items()
+                if isinstance(value, str) and name in _STATIC_PROPERTIES:
+                    table = self.by_class if name == "wm_class" else self.by_title
+                    table.setdefault(value, (order, result))
+                    continue
+            if properties and set(properties) <= _STATIC_PROPERTIES:
+                self.cacheable.append((order, match, result))
+            else:
+                self.dynamic.append((order, match, result))
+
+    def config_fingerprint(self) -> List[Tuple[Match, Any]]:
+        """ The rules, for incremental reloads to compare """
+        return self.rules
+
+    def _static_lookup(self, client) -> Optional[Tuple[int, Any]]:
+        wm_class = tuple(client.get_wm_class() or ())
+        key = (wm_class, client.name)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+
+        found = [self.by_class[c] for c in wm_class if c in self.by_class]
+        if client.name in self.by_title:
+            found.append(self.by_title[client.name])
+        best = min(found, key=lambda f: f[0]) if found else None
+        for order, match, result in self.cacheable:
+            if best is not None and order > best[0]:
+                break
+            if match.compare(client):
+                best = (order, result)
+                break
+
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = best
+        return best
+
+    def lookup(self, client, default: Any = None) -> Any:
+        """ Return the result of the first rule matching the client """
+        best = self._static_lookup(client)
+        for order, match, result in self.dynamic:
+            if best is not None and order > best[0]:
+                break
+            if match.compare(client):
+                return result
+        return default if best is None else best[1]
+
+    def matches(self, client) -> bool:
+        """ Whether any rule matches (usable as Match(func=index.matches)) """
+        return self.lookup(client, default=None) is not None
+
+
+if __name__ == "__main__":
+    # Check the index against a linear scan of Match.compare, then time both:
+    # python rules.py
+    import itertools
+    import random
+    import re
+    import time
+
+    class Client:
+        def __init__(self, wm_class, name, role="", wm_type="normal"):
+            self.wm_class, self.name, self.role, self.wm_type = wm_class, name, role, wm_type
+            self.wid = 1
+
+        def get_wm_class(self):
+            return self.wm_class
+
+        def get_wm_role(self):
+            return self.role
+
+        def get_wm_type(self):
+            return self.wm_type
+
+        def get_pid(self):
+            return 1
+
+    # No class is a substring of another, where the semantics differ
+    rules = [
+        (Match(wm_class="Firefox"), "1"),
+        (Match(wm_class="qutebrowser"), "1"),
+        (Match(title="nvim"), "2"),
+        (Match(wm_class="Postman"), "3"),
+        (Match(title=re.compile(r"^Spotify")), "8"),
+        (Match(wm_class=re.compile(r"^kit")), "4"),
+        (Match(wm_type="dialog"), "float"),
+        (Match(role="pop-up"), "float"),
+        (Match(func=lambda c: c.name == "special"), "9"),
+        (Match(wm_class="Firefox", title="nvim"), "never first"),
+        (Match(title="nvim"), "shadowed"),
+    ]
+    index = RuleIndex(rules)
+    classes = [(), ("Navigator", "Firefox"), ("qutebrowser",), ("Postman",),
+               ("kitty", "kitty"), ("spotify", "Spotify"), ("other",)]
+    names = ["", "nvim", "Spotify Premium", "special", "nvim - kitty"]
+    checked = 0
+    for _ in range(2):  # the second pass answers from the memo
+        for wm_class, name, role, wm_type in itertools.product(
+                classes, names, ["", "pop-up"], ["normal", "dialog"]):
+            client = Client(wm_class, name, role, wm_type)
+            expected = next((r for m, r in rules if m.compare(client)), None)
+            got = index.lookup(client)
+            assert got == expected, (wm_class, name, role, wm_type, got, expected)
+            assert index.matches(client) == (expected is not None)
+            checked += 1
+    print(f"{checked} lookups match Match.compare")
+
+    # Thousands of rules (classes, titles, title regexes), and window events
+    # from a thousand synthetic clients
+    random.seed(0)
+    rules = ([(Match(wm_class=f"app{i}"), str(i % 9)) for i in range(2000)]
+             + [(Match(title=f"window {i}"), "title") for i in range(500)]
+             + [(Match(title=re.compile(rf"^doc{i} ")), "regex") for i in range(200)]
+             + [(Match(wm_type="dialog"), "float")])
+    windows = [Client((f"app{random.randrange(4000)}",) * 2,
+                      random.choice([f"window {random.randrange(1000)}",
+                                     f"doc{random.randrange(400)} - editor", "shell"]))
+               for _ in range(1000)]
+    clients = [random.choice(windows) for _ in range(5000)]
+    index = RuleIndex(rules)
+    sample = windows[:200]  # the linear scan is too slow for all of them
+
+    start = time.perf_counter()
+    expected = [next((r for m, r in rules if m.compare(c)), None) for c in sample]
+    linear = (time.perf_counter() - start) / len(sample)
+    assert [index.lookup(c) for c in sample] == expected
+    index = RuleIndex(rules)
+    start = time.perf_counter()
+    for client in windows:
+        index.lookup(client)
+    first = (time.perf_counter() - start) / len(windows)
+    start = time.perf_counter()
+    for client in clients:
+        index.lookup(client)
+    memoized = (time.perf_counter() - start) / len(clients)
+    print(f"{len(rules)} rules: linear scan {linear * 1e6:.0f} us per lookup; index "
+          f"{first * 1e6:.1f} us for a new window, {memoized * 1e6:.2f} us per event after "
+          f"({len(clients)} events from {len(windows)} windows)")
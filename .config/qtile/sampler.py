@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from libqtile import widget
+from libqtile.log_utils import logger
+
+from graphs import RingGraph
+from timeline import TRACER
+
+PROC_STAT = "/proc/stat"
+PROC_MEMINFO = "/proc/meminfo"
+CPU_FREQ = "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"
+
+MEM_UNITS = {"G": 1024 ** 3, "M": 1024 ** 2, "K": 1024, "B": 1}
+
+
+def always() -> bool:
+    return True
+
+
+def _name(callback: Callable) -> str:
+    """ Trace name of a subscriber: its widget's name for widget methods """
+    owner = getattr(callback, "__self__", None)
+    return getattr(owner, "name", None) or getattr(callback, "__qualname__", "subscriber")
+
+
+class Subscriber:
+    __slots__ = ("callback", "every", "sources", "visible", "hidden", "suspended",
+                 "polls", "skipped")
+
+    def __init__(self, callback: Callable, every: int, sources: Tuple[str, ...],
+                 visible: Callable[[], bool], hidden: Optional[Callable] = None) -> None:
+        self.callback = callback
+        self.every = every
+        self.sources = sources
+        self.visible = visible
+        self.hidden = hidden  # called instead of callback while suspended
+        self.suspended = False
+        # Counters: callbacks run, and ticks skipped while hidden
+        self.polls = 0
+        self.skipped = 0
+
+
+class Sampler:
+    """ Reads system counters once per tick and fans them out to subscribers
+
+    Subscribers ask to be called every N ticks and name the sources they
+    read ("cpu", "memory"); a source is only read on ticks where someone
+    due needs it, and only once whatever the number of subscribers.
+    Subscribers that can't be seen are suspended: they are not called and
+    their sources are not read until refresh() finds them visible again.
+    """
+
+    def __init__(self, interval: float = 1.0) -> None:
+        self.interval = interval
+        self.subscribers: List[Subscriber] = []
+        self.qtile = None
+        self._handle = None
+
+        # Counters (see stats())
+        self.ticks = 0
+        self.reads = 0
+
+        self.cpu_percent = 0.0
+        self.cpu_freq = 0.0  # GHz
+        self.memory: Dict[str, int] = {}  # bytes
+        self._cpu_prev = (0, 0)
+
+    def subscribe(self, qtile, callback: Callable, every: int = 1, sources=(),
+                  visible: Callable[[], bool] = always,
+                  hidden: Optional[Callable] = None) -> None:
+        self.qtile = qtile
+        self.subscribers.append(
+            Subscriber(callback, max(1, every), tuple(sources), visible, hidden))
+        if self._handle is None:
+            self._handle = qtile.call_later(self.interval, self._tick)
+
+    def unsubscribe(self, callback: Callable) -> None:
+        self.subscribers = [s for s in self.subscribers if s.callback != callback]
+        if not self.subscribers and self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _visible(self, subscriber: Subscriber) -> bool:
+        subscriber.suspended = not subscriber.visible()
+        if subscriber.suspended:
+            subscriber.skipped += 1
+        return not subscriber.suspended
+
+    def _run(self, subscribers: List[Subscriber]) -> None:
+        try:
+            with TRACER.span("read", "poll"):
+                self.read({source for s in subscribers for source in s.sources})
+        except Exception:
+            # Subscribers get the previous values; the next tick tries again
+            logger.exception("Sampler could not read its sources")
+        for subscriber in subscribers:
+            callback = subscriber.hidden if subscriber.suspended else subscriber.callback
+            subscriber.polls += 1
+            start = time.perf_counter()
+            try:
+                callback(self)
+            except Exception:
+                logger.exception("Sampler subscriber failed")
+            TRACER.complete(_name(callback), "poll", start)
+
+    def _tick(self) -> None:
+        self.ticks += 1
+        try:
+            self._run([s for s in self.subscribers
+                       if self.ticks % s.every == 0 and (self._visible(s) or s.hidden)])
+        finally:
+            self._handle = self.qtile.call_later(self.interval, self._tick)
+
+    def refresh(self) -> None:
+        """ Update right away the subscribers revealed since the last tick """
+        revealed = [s for s in self.subscribers if s.suspended and s.visible()]
+        for subscriber in self.subscribers:
+            subscriber.suspended = not subscriber.visible()
+        self._run(revealed)
+
+    def read(self, sources) -> None:
+        if "cpu" in sources:
+            self._read_cpu()
+        if "memory" in sources:
+            self._read_memory()
+
+    def _read(self, path: str) -> str:
+        self.reads += 1
+        with open(path) as f:
+            return f.read()
+
+    def _read_cpu(self) -> None:
+        # cpu  user nice system idle iowait irq softirq steal ...
+        fields = [int(v) for v in self._read(PROC_STAT).split("\n", 1)[0].split()[1:9]]
+        total, idle = sum(fields), fields[3] + fields[4]
+        prev_total, prev_idle = self._cpu_prev
+        self._cpu_prev = (total, idle)
+        if total > prev_total:
+            self.cpu_percent = 100.0 * (1 - (idle - prev_idle) / (total - prev_total))
+        try:
+            self.cpu_freq = round(int(self._read(CPU_FREQ)) / 1000 ** 2, 1)
+        except (OSError, ValueError):
+            pass
+
+    def _read_memory(self) -> None:
+        memory = {}
+        for line in self._read(PROC_MEMINFO).splitlines():
+            name, value = line.split(":", 1)
+            memory[name] = int(value.split()[0]) * 1024
+        # Same definition of "used" as psutil (and so as qtile's widgets)
+        memory["MemUsed"] = (memory["MemTotal"] - memory["MemFree"] - memory["Buffers"]
+                             - memory["Cached"] - memory.get("SReclaimable", 0))
+        memory["SwapUsed"] = memory["SwapTotal"] - memory["SwapFree"]
+        # psutil's percent: memory not available, swap used
+        memory["MemPercent"] = round(100 * (1 - memory["MemAvailable"] / memory["MemTotal"]), 1)
+        memory["SwapPercent"] = (round(100 * memory["SwapUsed"] / memory["SwapTotal"], 1)
+                                 if memory["SwapTotal"] else 0.0)
+        self.memory = memory
+
+    def stats(self) -> Dict[str, int]:
+        return {"ticks": self.ticks, "reads": self.reads,
+                "subscribers": len(self.subscribers),
+                "polls": sum(s.polls for s in self.subscribers),
+                "skipped": sum(s.skipped for s in self.subscribers),
+                "suspended": sum(s.suspended for s in self.subscribers)}
+
+
+# reload_config() re-imports this module too: keep the running sampler (and
+# its timer) so the widgets of the old config unsubscribe from it
+SAMPLER = globals().get("SAMPLER") or Sampler()
+
+
+def is_visible(widget) -> bool:
+    """ Whether a widget is on screen: its bar is shown and no closed box hides it """
+    bar = widget.bar
+    return bar.is_show() and widget in bar.widgets
+
+
+class Sampled:
+    """ Mixin replacing a widget's own timer by a SAMPLER subscription """
+
+    sources: Tuple[str, ...] = ()
+    # Called instead of on_sample while the widget is hidden (None: skip)
+    on_hidden: Optional[Callable] = None
+
+    def _sample_every(self) -> int:
+        return round(self.update_interval / SAMPLER.interval)
+
+    def timer_setup(self):
+        SAMPLER.subscribe(self.qtile, self.on_sample, self._sample_every(), self.sources,
+                          visible=lambda: is_visible(self), hidden=self.on_hidden)
+        if self.sources:
+            SAMPLER.read(self.sources)
+        self.on_sample(SAMPLER)
+
+    def on_sample(self, sampler: Sampler) -> None:
+        self.update(self.poll())
+
+    def finalize(self):
+        SAMPLER.unsubscribe(self.on_sample)
+        super().finalize()
+
+
+class CPU(Sampled, widget.CPU):
+    sources = ("cpu",)
+
+    def poll(self):
+        return self.format.format(load_percent=round(SAMPLER.cpu_percent, 1),
+                                  freq_current=SAMPLER.cpu_freq)
+
+
+class Memory(Sampled, widget.Memory):
+    sources = ("memory",)
+
+    def poll(self):
+        mem = SAMPLER.memory
+        calc_mem = MEM_UNITS[self.measure_mem]
+        calc_swap = MEM_UNITS[self.measure_swap]
+        return self.format.format(
+            MemUsed=mem["MemUsed"] / calc_mem,
+            MemTotal=mem["MemTotal"] / calc_mem,
+            MemFree=mem["MemFree"] / calc_mem,
+            Available=mem["MemAvailable"] / calc_mem,
+            Buffers=mem["Buffers"] / calc_mem,
+            Active=mem["Active"] / calc_mem,
+            Inactive=mem["Inactive"] / calc_mem,
+            Shmem=mem["Shmem"] / calc_mem,
+            MemPercent=mem["MemPercent"],
+            SwapTotal=mem["SwapTotal"] / calc_swap,
+            SwapFree=mem["SwapFree"] / calc_swap,
+            SwapUsed=mem["SwapUsed"] / calc_swap,
+            SwapPercent=mem["SwapPercent"],
+            mm=self.measure_mem,
+            ms=self.measure_swap,
+        )
+
+
+class CPUGraph(Sampled, RingGraph, widget.CPUGraph):
+    sources = ("cpu",)
+
+    def _sample_every(self) -> int:
+        return round(self.frequency / SAMPLER.interval)
+
+    def on_sample(self, sampler: Sampler) -> None:
+        self.push(sampler.cpu_percent)
+
+
+class MemoryGraph(Sampled, RingGraph, widget.MemoryGraph):
+    sources = ("memory",)
+
+    def _sample_every(self) -> int:
+        return round(self.frequency / SAMPLER.interval)
+
+    def on_sample(self, sampler: Sampler) -> None:
+        self.maxvalue = sampler.memory["MemTotal"] // 1024 // 1024
+        self.push(sampler.memory["MemUsed"] // 1024 // 1024)
+
+
+class Battery(Sampled, widget.Battery):
+    """ Keeps its own sysfs parsing, but polls on the shared ticks """
+
+    def on_hidden(self, sampler: Sampler) -> None:
+        # poll() sends the notify_below warning; only drawing is skipped
+        self.poll()
+
+
+class Wlan(Sampled, widget.Wlan):
+    """ Keeps its own iwlib query, but polls on the shared ticks """
+
+
+class WidgetBox(widget.WidgetBox):
+    """ WidgetBox that wakes its sampled widgets up as soon as it opens """
+
+    # qtile 0.22 (the API this config targets) binds Button1 to cmd_toggle
+    def cmd_toggle(self):
+        super().cmd_toggle()
+        SAMPLER.refresh()
+
+
+if __name__ == "__main__":
+    # A minute of the CPU/memory widgets: each on its own timer calling psutil
+    # as qtile's widgets do, against one SAMPLER tick: python sampler.py
+    import builtins
+
+    import psutil
+
+    SECONDS = 60
+    opened = [0]
+    real_open = builtins.open
+
+    def counting_open(*args, **kwargs):
+        opened[0] += 1
+        return real_open(*args, **kwargs)
+
+    def measure(run) -> Tuple[int, int, float]:
+        opened[0] = 0
+        builtins.open = counting_open
+        start = time.perf_counter()
+        try:
+            wakeups = run()
+        finally:
+            builtins.open = real_open
+        return wakeups, opened[0], (time.perf_counter() - start) * 1000
+
+    def own_timers() -> int:
+        polls = [psutil.cpu_percent, psutil.cpu_freq,  # CPU
+                 psutil.cpu_times,  # CPUGraph
+                 psutil.virtual_memory, psutil.swap_memory,  # Memory
+                 psutil.virtual_memory]  # MemoryGraph
+        widgets = [polls[0:2], polls[2:3], polls[3:5], polls[5:6]]
+        for _ in range(SECONDS):
+            for widget_polls in widgets:  # every one at its default 1 s
+                for poll in widget_polls:
+                    poll()
+        return SECONDS * len(widgets)
+
+    class Qtile:
+        def call_later(self, delay, func):
+            return None
+
+    def shared() -> int:
+        sampler = Sampler()
+        for sources in (("cpu",), ("cpu",), ("memory",), ("memory",)):
+            sampler.subscribe(Qtile(), lambda s: None, 1, sources)
+        for _ in range(SECONDS):
+            sampler._tick()
+        return sampler.ticks
+
+    for name, run in (("own timers", own_timers), ("SAMPLER", shared)):
+        wakeups, opens, ms = measure(run)
+        print(f"{name}: {wakeups} wakeups, {opens} file opens, {ms:.1f} ms "
+              f"for {SECONDS} s of CPU, CPUGraph, Memory and MemoryGraph")
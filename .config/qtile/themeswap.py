@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from libqtile import bar as libbar
+from libqtile.log_utils import logger
+
+from colors import THEMES, Color, Theme, get_theme
+from notify import NOTIFIER
+
+# Theme picked at runtime, saved so that reload_config() and restarts keep it
+ACTIVE_PATH = os.path.expanduser("~/.cache/qtile/theme")
+# Theme the running widgets use
+LOADED = "dracula"
+
+
+def _saved() -> Optional[str]:
+    try:
+        with open(ACTIVE_PATH) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name if name in THEMES else None
+
+
+def _save(name: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(ACTIVE_PATH), exist_ok=True)
+        with open(ACTIVE_PATH, "w") as f:
+            f.write(name)
+    except OSError:
+        logger.exception("Could not save the theme to %s", ACTIVE_PATH)
+
+
+def active(default: str) -> str:
+    """ Theme name config.py should load: the last one swapped to, else default """
+    global LOADED
+    LOADED = _saved() or default
+    return LOADED
+
+
+# Widget/layout option -> theme attribute it is set from in config.py
+HINTS = {
+    "active": "groupbox_active",
+    "inactive": "groupbox_inactive",
+    "this_current_screen_border": "groupbox_this_current",
+    "this_screen_border": "groupbox_this",
+    "other_current_screen_border": "groupbox_other_current",
+    "other_screen_border": "groupbox_other",
+    "border_focus": "window_focused_border",
+    "border_normal": "window_border",
+}
+
+
+class Remap:
+    """ Finds the new colour of an option from its old colour
+
+    Every colour of a compiled theme is its own Color object, and config.py
+    hands those objects to the widgets as they are: the object an option
+    holds identifies the theme attribute it was set from. Hex strings (X11
+    borders) are new objects, so for them the attribute is guessed among
+    those that had that value: the option name picks one (HINTS, or .bg/.fg
+    for background/foreground options).
+    """
+
+    def __init__(self, old: Theme, new: Theme) -> None:
+        self.new = dict(new)
+        self.by_id: Dict[int, str] = {id(colour): path for path, colour in old}
+        self.paths: Dict[Color, List[str]] = {}
+        for path, colour in old:
+            self.paths.setdefault(colour, []).append(path)
+        self.changed = {path for (path, before), (_, after) in zip(old, new) if before != after}
+
+    def _guess(self, option: str, value: Color) -> Optional[str]:
+        paths = self.paths.get(value, [])
+        if not paths:
+            return None
+        hint = HINTS.get(option.lstrip("_"))
+        if hint in paths:
+            return hint
+        suffix = ".bg" if "background" in option else ".fg" if "foreground" in option else None
+        paths = [p for p in paths if suffix and p.endswith(suffix)] or paths
+        if len({self.new[p] for p in paths}) > 1:
+            logger.warning("Theme swap: %s is ambiguous (%s), using %s",
+                           option, ", ".join(paths), paths[0])
+        return paths[0]
+
+    def get(self, option: str, value: Color) -> Optional[Color]:
+        """ New colour for option, or None if it is unchanged (or not themed) """
+        path = self.by_id.get(id(value)) or self._guess(option, value)
+        if path not in self.changed:
+            return None
+        return self.new[path]
+
+
+def _widgets(qtile) -> Iterator:
+    for widget in qtile.widgets_map.values():
+        yield widget
+        yield from getattr(widget, "widgets", [])  # e.g. closed WidgetBox
+
+
+def _bars(qtile) -> Iterator[libbar.Bar]:
+    for screen in qtile.screens:
+        for gap in (screen.top, screen.bottom, screen.left, screen.right):
+            if isinstance(gap, libbar.Bar):
+                yield gap
+
+
+def _swap_colours(obj, remap: Remap) -> int:
+    changed = 0
+    for name, value in list(vars(obj).items()):
+        if not isinstance(value, Color):
+            continue
+        colour = remap.get(name, value)
+        if colour is None:
+            continue
+        # Go through properties (e.g. _TextBox.foreground updates its layout)
+        public = name.lstrip("_")
+        if public != name and isinstance(getattr(type(obj), public, None), property):
+            name = public
+        setattr(obj, name, colour)
+        changed += 1
+    return changed
+
+
+def _swap_hex(value, option: str, remap: Remap):
+    """ Same as Remap.get for options qtile keeps as hex strings """
+    if not isinstance(value, str):
+        return None
+    try:
+        colour = remap.get(option, Color(value))
+    except ValueError:  # named colour, not from a theme
+        return None
+    return None if colour is None else colour.hex
+
+
+def apply(qtile, old: Theme, new: Theme) -> Tuple[int, float]:
+    """ Push the colours that differ to the running widgets, bars and layouts """
+    start = time.perf_counter()
+    remap = Remap(old, new)
+    changed = 0
+
+    for widget in _widgets(qtile):
+        changed += _swap_colours(widget, remap)
+        layout = getattr(widget, "layout", None)
+        colour = getattr(layout, "colour", None)
+        if isinstance(colour, Color) and remap.get("foreground", colour) is not None:
+            layout.colour = remap.get("foreground", colour)
+        if hasattr(widget, "restyle"):  # e.g. RingGraph's cached line
+            widget.restyle()
+
+    bars = list(_bars(qtile))
+    for bar in bars:
+        changed += _swap_colours(bar, remap)
+        if isinstance(bar.border_color, list):
+            bar.border_color = [_swap_hex(c, "background", remap) or c
+                                for c in bar.border_color]
+
+    for group in qtile.groups:
+        for layout in [*group.layouts, group.floating_layout]:
+            for attr in ("border_focus", "border_normal"):
+                colour = _swap_hex(getattr(layout, attr, None), attr, remap)
+                if colour is not None:
+                    setattr(layout, attr, colour)
+                    changed += 1
+
+    # One repaint: bars (borders included), then window borders of the visible groups
+    for bar in bars:
+        bar._borders_drawn = False
+        bar.draw()
+    for group in qtile.groups:
+        if group.screen is not None:
+            group.layout_all()
+    return changed, (time.perf_counter() - start) * 1000
+
+
+def swap(qtile, name: str) -> None:
+    global LOADED
+    old = get_theme(LOADED)
+    new = get_theme(name)
+    changed, ms = apply(qtile, old, new)
+    LOADED = new.name
+    _save(new.name)
+    logger.info("Theme %s applied in %.1f ms (%d colours)", new.name, ms, changed)
+    NOTIFIER.send("Theme", f"{new.name} applied in {ms:.1f} ms", tag="theme")
+
+
+def cycle_theme(qtile) -> None:
+    """ Swap to the next theme of colors.THEMES (for lazy.function) """
+    names = list(THEMES)
+    swap(qtile, names[(names.index(LOADED) + 1) % len(names)])
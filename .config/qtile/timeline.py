@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Optional
+
+from libqtile.log_utils import logger
+
+from notify import NOTIFIER
+
+TRACE_DIR = os.path.expanduser("~/.cache/qtile")
+# Events kept while tracing; the oldest are dropped past this
+CAPACITY = 200_000
+PID = os.getpid()
+
+
+def now() -> float:
+    return time.perf_counter()
+
+
+class Tracer:
+    """ Timeline of WM events in the Chrome trace format (chrome://tracing, Perfetto)
+
+    Spans are "complete" events (ph X) with a category per kind: hook,
+    client, spawn, poll and paint. Recording is off until start(); events
+    go to a bounded deque and are written out by stop().
+    """
+
+    def __init__(self, capacity: int = CAPACITY) -> None:
+        self.enabled = False
+        self.events: Deque[dict] = deque(maxlen=capacity)
+        self.started = 0.0
+
+    def complete(self, name: str, cat: str, start: float,
+                 end: Optional[float] = None, **args) -> None:
+        """ Record a span from start to end (perf_counter seconds) """
+        if not self.enabled:
+            return
+        end = now() if end is None else end
+        self.events.append({"name": name, "cat": cat, "ph": "X", "pid": PID, "tid": PID,
+                            "ts": start * 1e6, "dur": (end - start) * 1e6, "args": args})
+
+    def instant(self, name: str, cat: str, **args) -> None:
+        if not self.enabled:
+            return
+        self.events.append({"name": name, "cat": cat, "ph": "i", "s": "g", "pid": PID,
+                            "tid": PID, "ts": now() * 1e6, "args": args})
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        if not self.enabled:
+            yield
+            return
+        start = now()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, **args)
+
+    def start(self) -> None:
+        self.events.clear()
+        self.started = time.time()
+        self.enabled = True
+
+    def stop(self) -> Optional[str]:
+        """ Stop recording and write the trace, returning its path """
+        self.enabled = False
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        path = os.path.join(TRACE_DIR, f"trace-{stamp}.json")
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, f)
+        except OSError:
+            logger.exception("Could not write %s", path)
+            return None
+        finally:
+            self.events.clear()
+        return path
+
+    def toggle(self, qtile=None) -> None:
+        """ Start or stop tracing (for lazy.function) """
+        if not self.enabled:
+            self.start()
+            NOTIFIER.send("Trace", "Recording", tag="trace")
+            return
+        count = len(self.events)
+        path = self.stop()
+        if path is not None:
+            logger.warning("Trace of %d events written to %s", count, path)
+            NOTIFIER.send("Trace", f"{count} events: {path}", expire=6000, tag="trace")
+
+
+# reload_config() re-imports this module: keep the running tracer, so a
+# trace can span a reload
+TRACER = globals().get("TRACER") or Tracer()
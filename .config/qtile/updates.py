@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import time
+from subprocess import CalledProcessError
+from typing import Optional
+
+from libqtile import widget
+from libqtile.log_utils import logger
+
+CACHE_PATH = os.path.expanduser("~/.cache/qtile/updates.json")
+PACMAN_DB = "/var/lib/pacman"
+# Query anyway after this many seconds, in case the mirrors moved on
+MAX_AGE = 3600
+
+
+def db_stamp() -> float:
+    """ Last change of the local package database or of the synced mirror dbs """
+    paths = [os.path.join(PACMAN_DB, "local"), *glob.glob(os.path.join(PACMAN_DB, "sync", "*.db"))]
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append(os.stat(path).st_mtime)
+        except OSError:
+            pass
+    return max(stamps, default=0.0)
+
+
+def load_cache() -> Optional[dict]:
+    """ The saved count, or None if the file is missing or malformed """
+    try:
+        with open(CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or not all(
+            isinstance(cache.get(key), (int, float)) for key in ("count", "stamp", "checked")):
+        return None
+    return cache
+
+
+def save_cache(count: int, stamp: float) -> None:
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    with open(CACHE_PATH, "w") as f:
+        json.dump({"count": count, "stamp": stamp, "checked": time.time()}, f)
+
+
+class CheckUpdates(widget.CheckUpdates):
+    """ CheckUpdates that only queries the package manager when its database changed
+
+    The last count is kept on disk, so it is shown right away on startup
+    and reload. Each poll (in qtile's thread pool) only stats the database:
+    the package manager is queried again once the local or sync database
+    is newer than the last check, or after MAX_AGE.
+    """
+
+    def _configure(self, qtile, bar):
+        super()._configure(qtile, bar)
+        cache = load_cache()
+        if cache is not None and self.cmd:
+            self.text = self._render(cache["count"])
+
+    def _render(self, count: int) -> str:
+        if count <= 0:
+            self.layout.colour = self.colour_no_updates
+            return self.no_update_string
+        updates = str(count)
+        if self.restart_indicator and os.path.exists("/var/run/reboot-required"):
+            updates += self.restart_indicator
+        self.layout.colour = self.colour_have_updates
+        return self.display_format.format(updates=updates)
+
+    def _count_updates(self) -> int:
+        try:
+            updates = self.call_process(self.cmd, shell=True)
+        except CalledProcessError:
+            updates = ""
+        return max(0, self.custom_command_modify(len(updates.splitlines())))
+
+    def poll(self):
+        if not self.cmd:
+            return "N/A"
+        stamp = db_stamp()
+        cache = load_cache()
+        # A pacman -Sy or an upgrade since the last check invalidates it
+        if (cache is not None and cache["stamp"] == stamp and stamp <= cache["checked"]
+                and time.time() - cache["checked"] < MAX_AGE):
+            return self._render(cache["count"])
+
+        count = self._count_updates()
+        try:
+            save_cache(count, stamp)
+        except OSError:
+            logger.exception("Could not save the updates cache")
+        return self._render(count)
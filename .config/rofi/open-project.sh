@@ -12,13 +12,12 @@ rofi_cmd() {
     -kb
 }
 
-root_dir="/home/igortxra/github/"
+# Projects index (roots in $PROJECT_ROOTS, default ~/github), see projects.py
+projects="$HOME/.config/rofi/projects.py"
 
-projects_dir=$(exa $root_dir --no-icons)
-
-# Pass variables to rofi dmenu
+# Pass the ranked projects to rofi dmenu
 run_rofi() {
-	echo -e $projects_dir | rofi_cmd
+	"$projects" list | rofi_cmd
 }
 
 # # Actions
@@ -27,5 +26,5 @@ if [[ $chosen = "" ]]; then
   exit 1;
 fi
 
-project_chosen="$root_dir$chosen"
+project_chosen=$("$projects" open "$chosen") || exit 1
 kitty -d "$project_chosen" nvim +NvimTreeToggle
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+""" Project index for open-project.sh
+
+    projects.py list          print projects, most frecent first
+    projects.py open NAME     record an open of NAME and print its path
+    projects.py watch         keep the index fresh with inotify (run at login)
+    projects.py bench [N]     time scanning and listing a synthetic tree of N repos
+
+Projects are the top-level directories of each root plus any git repository
+nested below them (up to MAX_DEPTH). Roots come from $PROJECT_ROOTS
+(colon separated), defaulting to ~/github.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+
+ROOTS = [os.path.expanduser(p) for p in
+         os.environ.get("PROJECT_ROOTS", "~/github").split(":") if p]
+CACHE_DIR = os.path.expanduser("~/.cache/rofi")
+INDEX_PATH = os.path.join(CACHE_DIR, "projects-index.json")
+SCORES_PATH = os.path.join(CACHE_DIR, "projects-scores.json")
+
+MAX_DEPTH = 4
+IGNORED = {".git", "node_modules", ".venv", "venv", "target", "build", "dist", "__pycache__"}
+# A visit weighs half as much after this many seconds
+HALF_LIFE = 7 * 24 * 3600
+# Quiet time after filesystem events before the index is saved
+SAVE_DELAY = 1.0
+
+
+def load(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def is_project(path, depth):
+    return depth == 1 or os.path.exists(os.path.join(path, ".git"))
+
+
+def walk(root, path, depth, found, dirs=None):
+    """ Add projects under path to found ({name: path}), and dirs to watch """
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name in IGNORED or not entry.is_dir(follow_symlinks=False):
+            continue
+        if is_project(entry.path, depth):
+            found[os.path.relpath(entry.path, root)] = entry.path
+        if dirs is not None:
+            dirs[entry.path] = (root, depth)
+        if depth < MAX_DEPTH:
+            walk(root, entry.path, depth + 1, found, dirs)
+
+
+def scan(dirs=None):
+    found = {}
+    for root in ROOTS:
+        if dirs is not None:
+            dirs[root] = (root, 0)
+        walk(root, root, 1, found, dirs)
+    return found
+
+
+def frecency(score, now):
+    if not score:
+        return 0.0
+    return score["score"] * 0.5 ** ((now - score["last"]) / HALF_LIFE)
+
+
+def cmd_list():
+    index = load(INDEX_PATH, None)
+    if index is None:
+        index = scan()
+        save(INDEX_PATH, index)
+    scores = load(SCORES_PATH, {})
+    now = time.time()
+    names = sorted(index, key=lambda n: (-frecency(scores.get(n), now), n))
+    sys.stdout.write("\n".join(names) + "\n")
+
+
+def cmd_open(name):
+    index = load(INDEX_PATH, None) or scan()
+    path = index.get(name)
+    if path is None:
+        return 1
+    scores = load(SCORES_PATH, {})
+    now = time.time()
+    scores[name] = {"score": frecency(scores.get(name), now) + 1, "last": now}
+    save(SCORES_PATH, scores)
+    print(path)
+    return 0
+
+
+# inotify(7)
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_DELETE_SELF = 0x400
+IN_ISDIR = 0x40000000
+IN_IGNORED = 0x8000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF
+EVENT = struct.Struct("iIII")
+
+
+class Watcher:
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.wds = {}  # wd -> path
+        self.dirs = {}  # path -> (root, depth)
+        self.index = scan(self.dirs)
+        for path in self.dirs:
+            self.add(path)
+        save(INDEX_PATH, self.index)
+
+    def add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.wds[wd] = path
+
+    def added(self, path, root, depth):
+        """ A directory appeared (or got a .git): index and watch its subtree """
+        dirs = {path: (root, depth)}
+        if is_project(path, depth):
+            self.index[os.path.relpath(path, root)] = path
+        if depth < MAX_DEPTH:
+            walk(root, path, depth + 1, self.index, dirs)
+        for new in dirs:
+            if new not in self.dirs:
+                self.add(new)
+        self.dirs.update(dirs)
+
+    def removed(self, path):
+        prefix = path + os.sep
+        self.index = {n: p for n, p in self.index.items()
+                      if p != path and not p.startswith(prefix)}
+        for gone in [d for d in self.dirs if d == path or d.startswith(prefix)]:
+            del self.dirs[gone]
+
+    def handle(self, wd, mask, name):
+        parent = self.wds.get(wd)
+        if parent is None or mask & IN_IGNORED:
+            self.wds.pop(wd, None)
+            return
+        if parent not in self.dirs:
+            return
+        root, depth = self.dirs[parent]
+        path = os.path.join(parent, name)
+        if name == ".git":
+            # git init / rm -rf .git: parent became or stopped being a repo
+            if depth > 1:
+                key = os.path.relpath(parent, root)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.index[key] = parent
+                else:
+                    self.index.pop(key, None)
+            return
+        if not mask & IN_ISDIR or name in IGNORED or depth >= MAX_DEPTH:
+            return
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            self.added(path, root, depth + 1)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            self.removed(path)
+
+    def run(self):
+        dirty_since = None
+        while True:
+            timeout = None if dirty_since is None else SAVE_DELAY
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                save(INDEX_PATH, self.index)
+                dirty_since = None
+                continue
+            data = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                self.handle(wd, mask, name)
+            dirty_since = time.monotonic()
+
+
+def cmd_bench(count):
+    """ Time a full scan, a listing from the index and an inotify update """
+    import contextlib
+    import io
+    import shutil
+    import tempfile
+
+    global ROOTS, INDEX_PATH, SCORES_PATH
+    tmp = tempfile.mkdtemp(prefix="projects-bench-")
+    try:
+        root = os.path.join(tmp, "github")
+        # Groups of 50 repos, each with a src/ tree and a nested repo in one of ten
+        for i in range(count):
+            repo = os.path.join(root, f"group{i // 50}", f"repo{i}")
+            os.makedirs(os.path.join(repo, ".git"))
+            os.makedirs(os.path.join(repo, "src", "lib"))
+            if i % 10 == 0:
+                os.makedirs(os.path.join(repo, "vendor", "dep", ".git"))
+        ROOTS = [root]
+        INDEX_PATH = os.path.join(tmp, "index.json")
+        SCORES_PATH = os.path.join(tmp, "scores.json")
+
+        def timed(func, *args):
+            start = time.perf_counter()
+            result = func(*args)
+            return result, (time.perf_counter() - start) * 1000
+
+        found, scan_ms = timed(scan)
+        save(INDEX_PATH, found)
+        opened = list(found)[::7]  # some history to rank by
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            for name in opened:
+                cmd_open(name)
+            start = len(output.getvalue())
+            _, list_ms = timed(cmd_list)
+        listed = output.getvalue()[start:].split()
+        assert len(listed) == len(found) and set(listed[:len(opened)]) == set(opened)
+
+        watcher, watch_ms = timed(Watcher)
+        new = os.path.join(root, "group0", "fresh")
+        os.makedirs(os.path.join(new, ".git"))
+        wd = next(wd for wd, path in watcher.wds.items() if path == os.path.dirname(new))
+        _, event_ms = timed(watcher.handle, wd, IN_CREATE | IN_ISDIR, "fresh")
+        assert os.path.relpath(new, root) in watcher.index
+        os.close(watcher.fd)
+
+        print(f"{count} repos ({len(found)} projects, {len(watcher.dirs)} dirs):")
+        print(f"  full scan (each Super+O without the index): {scan_ms:.1f} ms")
+        print(f"  list, ranked from the index: {list_ms:.1f} ms")
+        print(f"  watch start-up (scan + {len(watcher.wds)} watches): {watch_ms:.1f} ms")
+        print(f"  new repo applied from its inotify event: {event_ms:.2f} ms")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main(argv):
+    if len(argv) == 2 and argv[1] == "list":
+        cmd_list()
+        return 0
+    if len(argv) == 3 and argv[1] == "open":
+        return cmd_open(argv[2])
+    if len(argv) == 2 and argv[1] == "watch":
+        Watcher().run()
+        return 0
+    if len(argv) in (2, 3) and argv[1] == "bench":
+        cmd_bench(int(argv[2]) if len(argv) == 3 else 5000)
+        return 0
+    sys.stderr.write(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))